@@ -0,0 +1,53 @@
+"""Асинхронные представления лёгких эндпоинтов для режима ASGI.
+
+Цикл событий только принимает соединения и отдаёт ответы,
+а запросы к БД и кэшу выполняются в ограниченном пуле потоков.
+"""
+from django.shortcuts import redirect
+from django.urls import reverse
+
+from api.views import (
+    IngredientViewSet,
+    RecipeViewSet,
+    TagViewSet,
+    resolve_short_link
+)
+from core.async_db import run_in_db_pool
+from recipes.short_links import decode_short_link
+
+
+def offloaded(view):
+    """Асинхронная обёртка синхронного представления."""
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_db_pool(view, request, *args, **kwargs)
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return wrapper
+
+
+tag_list = offloaded(TagViewSet.as_view({'get': 'list'}))
+tag_detail = offloaded(TagViewSet.as_view({'get': 'retrieve'}))
+ingredient_list = offloaded(IngredientViewSet.as_view({'get': 'list'}))
+ingredient_detail = offloaded(
+    IngredientViewSet.as_view({'get': 'retrieve'})
+)
+recipe_detail = offloaded(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+
+
+async def redirect_to_recipe_detail(request, short_link):
+    """Редирект с короткой ссылки.
+
+    Коды из id рецепта разбираются без обращения к БД,
+    в пул уходят только старые коды.
+    """
+    recipe_id = decode_short_link(short_link)
+    if recipe_id is not None:
+        return redirect(
+            reverse('api:recipe-detail', kwargs={'pk': recipe_id})
+        )
+    return redirect(await run_in_db_pool(resolve_short_link, short_link))
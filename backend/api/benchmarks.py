@@ -0,0 +1,26 @@
+"""Замеры эндпоинтов через pytest.
+
+pytest api/benchmarks.py
+
+Замеры идут в тестовой БД pytest-django. Если есть файл базовых
+результатов (BENCHMARK_BASELINE), рост числа запросов или времени
+ответа относительно него роняет тест.
+"""
+import io
+import os
+
+import pytest
+
+from api.management.commands.benchmark import Command
+
+
+@pytest.mark.django_db
+def test_endpoints():
+    command = Command(stdout=io.StringIO())
+    options = command.create_parser('manage.py', 'benchmark').parse_args([
+        '--dataset', os.getenv('BENCHMARK_DATASET', 'small'),
+        '--baseline', os.getenv(
+            'BENCHMARK_BASELINE', 'benchmark_baseline.json'
+        ),
+    ])
+    command.benchmark(vars(options))
@@ -0,0 +1,70 @@
+"""Кэширование ответов справочников."""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+from core.constants import CATALOG_CACHE_TIMEOUT
+from core.db_routing import fresh_reads
+from recipes.catalog import get_catalog_version
+
+CATALOG_RESPONSE_KEY = 'catalog-response:{}'
+
+
+def cache_catalog_response(model):
+    """Кэширование сериализованного ответа справочника.
+
+    Ответ хранится под ключом из версии справочника и параметров
+    запроса, поэтому устаревает при любом изменении справочника.
+    Клиент с актуальным ETag получает 304 без обращения к БД.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            renderer = request.accepted_renderer
+            if not isinstance(renderer, JSONRenderer):
+                return view_func(request, *args, **kwargs)
+            version = get_catalog_version(model)
+            digest = hashlib.md5(
+                '|'.join((
+                    model._meta.label_lower,
+                    str(version),
+                    request.path,
+                    *sorted(
+                        f'{key}={value}'
+                        for key, values in request.query_params.lists()
+                        for value in values
+                    )
+                )).encode()
+            ).hexdigest()
+            etag = f'"{digest}"'
+            last_modified = int(version)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return response
+            key = CATALOG_RESPONSE_KEY.format(digest)
+            content = cache.get(key)
+            if content is None:
+                with fresh_reads(version):
+                    response = view_func(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                content = renderer.render(
+                    response.data,
+                    request.accepted_media_type,
+                    {'request': request, 'response': response}
+                )
+                cache.set(key, content, CATALOG_CACHE_TIMEOUT)
+            response = HttpResponse(content, content_type=renderer.media_type)
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,212 @@
+"""Кэш документов Рецептов, общих для всех пользователей.
+
+Документ - вывод GetRecipeSerializer без флагов пользователя.
+Ключ включает версии Рецепта, его автора и справочников,
+поэтому любое изменение этих данных даёт новый ключ.
+Флаги пользователя накладываются на документ при каждом ответе.
+
+Документы, которых нет в кэше, собираются сериализатором
+или, в быстром режиме, простыми функциями из строк values().
+"""
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from api.fields import image_variant_urls
+from api.serializers import GetRecipeSerializer
+from core.constants import (
+    AVATAR_IMAGE_SIZES,
+    RECIPE_DOCUMENT_CACHE_TIMEOUT,
+    RECIPE_IMAGE_SIZES
+)
+from core.db_routing import fresh_reads
+from core.images import variant_names
+from recipes.catalog import get_catalog_version
+from recipes.models import (
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    Tag
+)
+from users.models import User
+
+RECIPE_DOCUMENT_KEY = 'recipe-document:{}:{}'
+RECIPE_VARIANTS = variant_names(RECIPE_IMAGE_SIZES)
+AVATAR_VARIANTS = variant_names(AVATAR_IMAGE_SIZES)
+
+
+def catalog_versions():
+    """Версии справочников, данные которых входят в документ."""
+    return get_catalog_version(Tag), get_catalog_version(Ingredient)
+
+
+def documents_version(versions, request):
+    """Общая для всех документов запроса часть версии."""
+    return ':'.join(map(str, (*versions, request.build_absolute_uri('/'))))
+
+
+def document_key(recipe_id, updated_at, author_updated_at, version):
+    version = ':'.join(map(str, (
+        updated_at.timestamp(), author_updated_at.timestamp(), version
+    )))
+    return RECIPE_DOCUMENT_KEY.format(
+        recipe_id, hashlib.md5(version.encode()).hexdigest()
+    )
+
+
+def serialized_documents(recipe_ids, request):
+    """Документы Рецептов через GetRecipeSerializer."""
+    recipes = Recipe.objects.with_related(request.user).filter(
+        pk__in=recipe_ids
+    )
+    for recipe, data in zip(recipes, GetRecipeSerializer(
+        recipes, many=True, context={'request': request}
+    ).data):
+        yield recipe.updated_at, recipe.author.updated_at, {
+            **data,
+            'author': {**data['author'], 'is_subscribed': False},
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+        }
+
+
+def image_url(storage, name, request):
+    if not name:
+        return None
+    return request.build_absolute_uri(storage.url(name))
+
+
+def fast_documents(recipe_ids, request):
+    """Документы Рецептов из строк values() без сериализаторов.
+
+    Повторяет вывод GetRecipeSerializer поле в поле;
+    совпадение проверяют тесты api.tests и команда check_read_paths.
+    """
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).values(
+        'id', 'author_id', 'name', 'image', 'image_variants', 'text',
+        'cooking_time', 'updated_at'
+    )
+    tags = defaultdict(list)
+    for row in RecipeTag.objects.filter(recipe_id__in=recipe_ids).order_by(
+        'recipe_id', 'id'
+    ).values('recipe_id', 'tag_id', 'tag__name', 'tag__slug'):
+        tags[row['recipe_id']].append({
+            'id': row['tag_id'],
+            'name': row['tag__name'],
+            'slug': row['tag__slug'],
+        })
+    ingredients = defaultdict(list)
+    for row in RecipeIngredient.objects.filter(
+        recipe_id__in=recipe_ids
+    ).order_by('recipe_id', 'id').values(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients[row['recipe_id']].append({
+            'id': row['ingredient_id'],
+            'name': row['ingredient__name'],
+            'measurement_unit': row['ingredient__measurement_unit'],
+            'amount': row['amount'],
+        })
+    recipes = list(recipes)
+    recipe_storage = Recipe._meta.get_field('image').storage
+    avatar_storage = User._meta.get_field('avatar').storage
+    authors = {
+        row['id']: row for row in User.objects.filter(
+            pk__in={recipe['author_id'] for recipe in recipes}
+        ).values(
+            'id', 'email', 'username', 'first_name', 'last_name',
+            'avatar', 'avatar_variants', 'updated_at'
+        )
+    }
+    for recipe in recipes:
+        author = authors[recipe['author_id']]
+        yield recipe['updated_at'], author['updated_at'], {
+            'id': recipe['id'],
+            'tags': tags[recipe['id']],
+            'author': {
+                'email': author['email'],
+                'id': author['id'],
+                'username': author['username'],
+                'first_name': author['first_name'],
+                'last_name': author['last_name'],
+                'is_subscribed': False,
+                'avatar': image_url(avatar_storage, author['avatar'], request),
+                'avatar_variants': image_variant_urls(
+                    author['avatar'], author['avatar_variants'],
+                    avatar_storage, AVATAR_VARIANTS, request
+                ),
+            },
+            'ingredients': ingredients[recipe['id']],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': recipe['name'],
+            'image': image_url(recipe_storage, recipe['image'], request),
+            'image_variants': image_variant_urls(
+                recipe['image'], recipe['image_variants'],
+                recipe_storage, RECIPE_VARIANTS, request
+            ),
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+        }
+
+
+def build_documents(recipe_ids, request, versions, fast=False):
+    """Сборка и кэширование документов, которых нет в кэше."""
+    builder = fast_documents if fast else serialized_documents
+    version = documents_version(versions, request)
+    documents = {}
+    cached = {}
+    with fresh_reads(*versions):
+        for updated_at, author_updated_at, document in builder(
+            recipe_ids, request
+        ):
+            documents[document['id']] = cached[document_key(
+                document['id'], updated_at, author_updated_at, version
+            )] = document
+    cache.set_many(cached, RECIPE_DOCUMENT_CACHE_TIMEOUT)
+    return documents
+
+
+def recipe_documents(recipes, request, fast=False):
+    """Документы Рецептов с флагами текущего пользователя.
+
+    recipes - выборка RecipeQuerySet.with_versions.
+    """
+    versions = catalog_versions()
+    version = documents_version(versions, request)
+    keys = [
+        document_key(
+            recipe.id, recipe.updated_at, recipe.author_updated_at, version
+        )
+        for recipe in recipes
+    ]
+    cached = cache.get_many(keys)
+    missing = [
+        recipe.id for recipe, key in zip(recipes, keys) if key not in cached
+    ]
+    built = (
+        build_documents(missing, request, versions, fast) if missing else {}
+    )
+    result = []
+    for recipe, key in zip(recipes, keys):
+        document = cached.get(key) or built.get(recipe.id)
+        if document is None:
+            # Рецепт удалён между запросами.
+            continue
+        result.append({
+            **document,
+            'author': {
+                **document['author'],
+                'is_subscribed': getattr(
+                    recipe, 'author_is_subscribed', False
+                ),
+            },
+            'is_favorited': getattr(recipe, 'is_favorited', False),
+            'is_in_shopping_cart': getattr(
+                recipe, 'is_in_shopping_cart', False
+            ),
+        })
+    return result
@@ -0,0 +1,73 @@
+import uuid
+
+import filetype
+from django.core.files.base import File
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+from core.images import variant_names
+
+
+def image_variant_urls(image_name, variants, storage, names, request=None):
+    """Ссылки на варианты изображения по имени его файла.
+
+    Пока варианты не построены, вместо каждого из них
+    отдаётся ссылка на оригинал.
+    """
+    if not image_name:
+        return None
+    url = storage.url(image_name)
+    urls = dict.fromkeys(names, url)
+    variants = variants or {}
+    if variants.get('source') == image_name:
+        urls.update(
+            (name, storage.url(variants[name]))
+            for name in names
+            if name in variants
+        )
+    if request is None:
+        return urls
+    return {
+        name: request.build_absolute_uri(url)
+        for name, url in urls.items()
+    }
+
+
+class ImageVariantsField(serializers.Field):
+    """Ссылки на уменьшенные варианты изображения."""
+
+    def __init__(self, field_name, sizes, **kwargs):
+        self.field_name_on_model = field_name
+        self.variants = variant_names(sizes)
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        return image_variant_urls(
+            getattr(instance, self.field_name_on_model).name,
+            getattr(instance, f'{self.field_name_on_model}_variants'),
+            instance._meta.get_field(self.field_name_on_model).storage,
+            self.variants,
+            self.context.get('request')
+        )
+
+
+class UploadImageField(Base64ImageField):
+    """Изображение строкой base64 или загруженным файлом.
+
+    Временный файл загрузки не перемещается хранилищем,
+    а копируется по частям и удаляется вместе с запросом.
+    """
+
+    def to_internal_value(self, data):
+        if not isinstance(data, UploadedFile):
+            return super().to_internal_value(data)
+        extension = filetype.guess_extension(data.read(261))
+        data.seek(0)
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        data.name = f'{uuid.uuid4()}.{extension}'
+        serializers.ImageField.to_internal_value(self, data)
+        return File(data, name=data.name)
@@ -1,11 +1,43 @@
+from collections import defaultdict
+
+from django.db.models import Case, Exists, FloatField, OuterRef, Value, When
 from django_filters.rest_framework import (
+    BaseInFilter,
     BooleanFilter,
     CharFilter,
+    ChoiceFilter,
     FilterSet,
-    AllValuesMultipleFilter
+    MultipleChoiceFilter,
+    NumberFilter
 )
 
-from recipes.models import Ingredient, Recipe
+from core.constants import INGREDIENT_MATCH_LIMIT
+from recipes.catalog import recipe_ingredient_index, tag_map
+from recipes.models import Ingredient, Recipe, RecipeIngredient, RecipeTag
+from recipes.search import search_recipes
+
+
+class TagsFilter(MultipleChoiceFilter):
+    """Фильтр Рецептов по слагам Тегов.
+
+    Слаги проверяются по закэшированному справочнику Тегов,
+    а Рецепты отбираются через EXISTS без размножения строк.
+    """
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('choices', tag_map.choices)
+        super().__init__(*args, **kwargs)
+
+    def filter(self, queryset, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe=OuterRef('pk'), tag_id__in=tag_map.ids(value)
+        )))
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    """Фильтр по списку чисел через запятую."""
 
 
 class IngredientFilterSet(FilterSet):
@@ -21,9 +53,20 @@ class IngredientFilterSet(FilterSet):
 class RecipeFilterSet(FilterSet):
     """Фильтр для Рецептов."""
 
-    tags = AllValuesMultipleFilter(
-        field_name='tags__slug',
-        lookup_expr='contains',
+    tags = TagsFilter()
+
+    search = CharFilter(method='get_search')
+
+    ingredients = NumberInFilter(method='get_ingredients')
+    exclude_ingredients = NumberInFilter(method='get_ingredients')
+    ingredients_match = ChoiceFilter(
+        choices=(('all', 'all'), ('any', 'any')),
+        method='get_ingredients_match'
+    )
+
+    ordering = ChoiceFilter(
+        choices=(('popularity', 'popularity'), ('-popularity', '-popularity')),
+        method='get_ordering'
     )
 
     is_favorited = BooleanFilter(
@@ -35,7 +78,79 @@ class RecipeFilterSet(FilterSet):
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author',
+            'tags',
+            'search',
+            'ingredients',
+            'exclude_ingredients',
+            'ingredients_match',
+            'ordering',
+            'is_favorited',
+            'is_in_shopping_cart'
+        )
+
+    def get_search(self, queryset, name, value):
+        """Поиск по названию, описанию и Ингридиентам."""
+        value = value.strip()
+        if not value:
+            return queryset
+        return search_recipes(queryset, value)
+
+    def get_ingredients(self, queryset, name, value):
+        """Рецепты из имеющихся Ингридиентов.
+
+        Рецепты отбираются через EXISTS, а упорядочиваются по доле
+        их Ингридиентов, которая уже есть. Доли считаются по
+        инвертированному индексу Ингридиентов для первых
+        INGREDIENT_MATCH_LIMIT Рецептов, остальные идут после них
+        в обычном порядке.
+        """
+        data = self.form.cleaned_data
+        include = [int(pk) for pk in data.get('ingredients') or ()]
+        exclude = [int(pk) for pk in data.get('exclude_ingredients') or ()]
+        if name == 'exclude_ingredients':
+            return queryset.exclude(Exists(RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk'), ingredient_id__in=exclude
+            )))
+        match_all = data.get('ingredients_match') != 'any'
+        if match_all:
+            for ingredient_id in include:
+                queryset = queryset.filter(Exists(
+                    RecipeIngredient.objects.filter(
+                        recipe=OuterRef('pk'), ingredient_id=ingredient_id
+                    )
+                ))
+        else:
+            queryset = queryset.filter(Exists(RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk'), ingredient_id__in=include
+            )))
+        groups = defaultdict(list)
+        for recipe_id, coverage in recipe_ingredient_index.match(
+            include, exclude, match_all=match_all,
+            limit=INGREDIENT_MATCH_LIMIT
+        ):
+            groups[coverage].append(recipe_id)
+        if not groups:
+            return queryset
+        return queryset.annotate(
+            ingredient_coverage=Case(
+                *(
+                    When(pk__in=ids, then=Value(coverage))
+                    for coverage, ids in groups.items()
+                ),
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        ).order_by('-ingredient_coverage', *Recipe._meta.ordering)
+
+    def get_ingredients_match(self, queryset, name, value):
+        """Режим учитывается в фильтре ingredients."""
+        return queryset
+
+    def get_ordering(self, queryset, name, value):
+        """Сортировка по популярности по индексу счётчиков."""
+        return queryset.by_popularity(descending=value.startswith('-'))
 
     def get_is_favorited(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -0,0 +1,369 @@
+import json
+import random
+import time
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    teardown_databases
+)
+from rest_framework.test import APIClient
+
+from recipes.cart_totals import rebuild_cart_totals
+from recipes.catalog import bump_catalog_version
+from recipes.counters import reconcile_counters
+from recipes.feed import rebuild_feed
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeActivity,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCartRecipe,
+    Tag
+)
+from recipes.search import rebuild_search_vectors
+from recipes.trending import current_period, refresh_trending
+from users.models import Subscribe, User
+
+# Размеры наборов данных: рецепты, пользователи, подписки, избранное
+# и корзина пользователя, от имени которого выполняются запросы.
+DATASETS = {
+    'small': {
+        'recipes': 1_000,
+        'users': 1_000,
+        'subscriptions': 50,
+        'favorites': 200,
+        'cart': 100,
+    },
+    'large': {
+        'recipes': 100_000,
+        'users': 10_000,
+        'subscriptions': 500,
+        'favorites': 5_000,
+        'cart': 1_000,
+    },
+}
+BENCHMARK_USERNAME = 'benchmark'
+BENCHMARK_USER_PREFIX = 'benchmark_author_'
+BENCHMARK_IMAGE = 'recipes/images/temp.png'
+BATCH_SIZE = 1_000
+
+# Замеряемые эндпоинты: имя, URL и нужна ли авторизация.
+ENDPOINTS = (
+    ('recipes_list', '/api/recipes/', False),
+    ('recipes_list_auth', '/api/recipes/', True),
+    ('recipes_list_limit_50', '/api/recipes/?limit=50', True),
+    ('recipes_deep_page', '/api/recipes/?page=100', True),
+    ('recipes_filter_tags', '/api/recipes/?tags=breakfast&tags=lunch', True),
+    ('recipes_search', '/api/recipes/?search=Рецепт+42', True),
+    ('recipes_popular', '/api/recipes/?ordering=-popularity', True),
+    ('recipes_trending', '/api/recipes/trending/?window=7d', True),
+    ('recipes_is_favorited', '/api/recipes/?is_favorited=1', True),
+    ('recipe_retrieve', '/api/recipes/{recipe_id}/', True),
+    ('users_list', '/api/users/', True),
+    ('subscriptions', '/api/users/subscriptions/?recipes_limit=3', True),
+    ('recipes_feed', '/api/recipes/feed/', True),
+    ('download_shopping_cart', '/api/recipes/download_shopping_cart/', True),
+    ('ingredients_search', '/api/ingredients/?name=мо', False),
+    ('tags_list', '/api/tags/', False),
+)
+
+
+class QueryTimer:
+    """Обёртка выполнения SQL: считает запросы и время в БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка значений."""
+    return values[round(fraction * (len(values) - 1))]
+
+
+class Command(BaseCommand):
+    """Замер количества запросов и времени ответа ключевых эндпоинтов."""
+
+    help = (
+        'Создаёт тестовую БД, заполняет её данными и замеряет количество '
+        'SQL-запросов, время в БД и p50/p99 времени ответа эндпоинтов. '
+        'Рабочая БД не используется.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dataset', choices=DATASETS, default='small',
+            help='Размер набора данных.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров на эндпоинт.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора случайных чисел.'
+        )
+        parser.add_argument(
+            '--baseline', default='benchmark_baseline.json',
+            help='Файл с базовыми результатами.'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Сохранить результаты как базовые.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост p50 относительно базовых результатов.'
+        )
+        parser.add_argument(
+            '--skip-seed', action='store_true',
+            help='Не заполнять БД перед замерами.'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help=(
+                'Не удалять тестовую БД после замеров и использовать '
+                'оставшуюся от прошлого запуска.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть положительным.')
+        databases = setup_databases(
+            verbosity=0, interactive=False, keepdb=options['keepdb']
+        )
+        try:
+            self.benchmark(options)
+        finally:
+            teardown_databases(
+                databases, verbosity=0, keepdb=options['keepdb']
+            )
+
+    def benchmark(self, options):
+        """Заполнение текущей БД и замеры эндпоинтов."""
+        if not options['skip_seed']:
+            self.seed(DATASETS[options['dataset']], options['seed'])
+        user = User.objects.get(username=BENCHMARK_USERNAME)
+        recipe_id = Recipe.objects.values_list('id', flat=True).first()
+        results = {}
+        for name, url, auth in ENDPOINTS:
+            results[name] = self.measure(
+                url.format(recipe_id=recipe_id),
+                user if auth else None,
+                options['repeat']
+            )
+            self.report(name, results[name])
+
+        baseline_path = Path(options['baseline'])
+        if options['save_baseline']:
+            baseline_path.write_text(
+                json.dumps(
+                    {'dataset': options['dataset'], 'results': results},
+                    indent=2
+                ),
+                encoding='UTF-8'
+            )
+            self.stdout.write(f'Базовые результаты сохранены: {baseline_path}')
+        elif baseline_path.exists():
+            self.compare(
+                json.loads(baseline_path.read_text(encoding='UTF-8')),
+                options['dataset'],
+                results,
+                options['tolerance']
+            )
+
+    def measure(self, url, user, repeat):
+        client = APIClient()
+        if user:
+            client.force_authenticate(user)
+        timer = QueryTimer()
+        timings = []
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with connection.execute_wrapper(timer):
+                    response = client.get(url)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                timings.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise CommandError(f'{url}: статус {response.status_code}.')
+        timings.sort()
+        return {
+            'queries': timer.count // repeat,
+            'db_ms': round(timer.duration / repeat * 1000, 3),
+            'p50_ms': round(percentile(timings, 0.5) * 1000, 3),
+            'p99_ms': round(percentile(timings, 0.99) * 1000, 3),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<25} queries={result["queries"]:<4} '
+            f'db={result["db_ms"]}ms p50={result["p50_ms"]}ms '
+            f'p99={result["p99_ms"]}ms'
+        )
+
+    def compare(self, baseline, dataset, results, tolerance):
+        if baseline.get('dataset') != dataset:
+            raise CommandError(
+                f'Базовые результаты получены на наборе '
+                f'{baseline.get("dataset")}, а не {dataset}.'
+            )
+        regressions = []
+        for name, result in results.items():
+            previous = baseline['results'].get(name)
+            if previous is None:
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append(
+                    f'{name}: запросов {previous["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            if result['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p50 {previous["p50_ms"]}ms -> '
+                    f'{result["p50_ms"]}ms'
+                )
+        if regressions:
+            raise CommandError(
+                'Обнаружены регрессии:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий не обнаружено.'))
+
+    @transaction.atomic
+    def seed(self, dataset, seed):
+        """Заполнение БД данными заданного размера."""
+        if (
+            User.objects.filter(username=BENCHMARK_USERNAME).exists()
+            and Recipe.objects.count() >= dataset['recipes']
+        ):
+            return
+        if not Ingredient.objects.exists() or not Tag.objects.exists():
+            call_command('fill_db')
+        rng = random.Random(seed)
+        password = make_password(None)
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={
+                'email': f'{BENCHMARK_USERNAME}@foodgram.local',
+                'password': password,
+            }
+        )
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{BENCHMARK_USER_PREFIX}{index}',
+                    email=f'{BENCHMARK_USER_PREFIX}{index}@foodgram.local',
+                    password=password,
+                )
+                for index in range(dataset['users'])
+            ),
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        authors = list(
+            User.objects.filter(
+                username__startswith=BENCHMARK_USER_PREFIX
+            ).values_list('id', flat=True)
+        )
+        tags = list(Tag.objects.values_list('id', flat=True))
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+
+        missing = dataset['recipes'] - Recipe.objects.count()
+        first_id = (
+            Recipe.objects.order_by('-id').values_list('id', flat=True).first()
+            or 0
+        )
+        Recipe.objects.bulk_create(
+            (
+                Recipe(
+                    name=f'Рецепт {index}',
+                    text=f'Описание рецепта {index}',
+                    image=BENCHMARK_IMAGE,
+                    cooking_time=rng.randint(1, 180),
+                    author_id=rng.choice(authors),
+                )
+                for index in range(missing)
+            ),
+            batch_size=BATCH_SIZE
+        )
+        recipes = list(
+            Recipe.objects.filter(id__gt=first_id).values_list('id', flat=True)
+        )
+        RecipeTag.objects.bulk_create(
+            (
+                RecipeTag(recipe_id=recipe, tag_id=tag)
+                for recipe in recipes
+                for tag in rng.sample(tags, rng.randint(1, len(tags)))
+            ),
+            batch_size=BATCH_SIZE
+        )
+        RecipeIngredient.objects.bulk_create(
+            (
+                RecipeIngredient(
+                    recipe_id=recipe,
+                    ingredient_id=ingredient,
+                    amount=rng.randint(1, 500)
+                )
+                for recipe in recipes
+                for ingredient in rng.sample(ingredients, rng.randint(3, 10))
+            ),
+            batch_size=BATCH_SIZE
+        )
+
+        all_recipes = list(Recipe.objects.values_list('id', flat=True))
+        Subscribe.objects.bulk_create(
+            (
+                Subscribe(user=user, author_id=author)
+                for author in rng.sample(
+                    authors, min(dataset['subscriptions'], len(authors))
+                )
+            ),
+            ignore_conflicts=True
+        )
+        period = current_period()
+        activity = {}
+        for model, field, size in (
+            (FavoriteRecipe, 'favorites', dataset['favorites']),
+            (ShoppingCartRecipe, 'carts', dataset['cart']),
+        ):
+            sample = rng.sample(all_recipes, min(size, len(all_recipes)))
+            model.objects.bulk_create(
+                (model(user=user, recipe_id=recipe) for recipe in sample),
+                batch_size=BATCH_SIZE,
+                ignore_conflicts=True
+            )
+            for recipe in sample:
+                setattr(
+                    activity.setdefault(
+                        recipe, RecipeActivity(recipe_id=recipe, period=period)
+                    ),
+                    field,
+                    1
+                )
+        RecipeActivity.objects.bulk_create(
+            activity.values(), batch_size=BATCH_SIZE, ignore_conflicts=True
+        )
+        rebuild_cart_totals(BATCH_SIZE)
+        rebuild_search_vectors(BATCH_SIZE)
+        bump_catalog_version(RecipeIngredient)
+        reconcile_counters(BATCH_SIZE)
+        rebuild_feed()
+        refresh_trending()
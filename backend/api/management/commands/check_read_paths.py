@@ -0,0 +1,62 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.documents import fast_documents, serialized_documents
+from api.renderers import ORJSONRenderer
+from recipes.models import Recipe
+
+BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет документы Рецептов, собранные GetRecipeSerializer '
+        'и быстрым путём из values(), вместе с их JSON побайтно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=None,
+            help='Проверить только столько последних Рецептов.'
+        )
+        parser.add_argument(
+            '--host',
+            default='testserver',
+            help='Хост, от которого строятся абсолютные ссылки.'
+        )
+
+    def handle(self, *args, **options):
+        request = Request(
+            APIRequestFactory().get('/', SERVER_NAME=options['host'])
+        )
+        request.user = AnonymousUser()
+        recipe_ids = list(
+            Recipe.objects.values_list('id', flat=True)[:options['limit']]
+        )
+        mismatches = 0
+        for start in range(0, len(recipe_ids), BATCH_SIZE):
+            batch = recipe_ids[start:start + BATCH_SIZE]
+            expected = {
+                document['id']: document
+                for *_, document in serialized_documents(batch, request)
+            }
+            for *_, document in fast_documents(batch, request):
+                reference = expected.pop(document['id'], None)
+                if JSONRenderer().render(reference) != (
+                    ORJSONRenderer().render(document)
+                ):
+                    mismatches += 1
+                    self.stderr.write(f'Рецепт {document["id"]}: расхождение')
+            for recipe_id in expected:
+                mismatches += 1
+                self.stderr.write(f'Рецепт {recipe_id}: нет в быстром пути')
+        if mismatches:
+            raise CommandError(f'Расхождений: {mismatches}.')
+        self.stdout.write(
+            self.style.SUCCESS(f'Проверено Рецептов: {len(recipe_ids)}.')
+        )
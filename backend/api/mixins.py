@@ -0,0 +1,40 @@
+from rest_framework.permissions import SAFE_METHODS
+
+from core.db_routing import (
+    is_pinned,
+    pin_to_primary,
+    replica_reads,
+    use_replicas
+)
+
+
+class ReplicaReadMixin:
+    """Чтение с реплик для безопасных запросов к replica_actions.
+
+    После успешной записи пользователь на время отставания
+    реплик читает из основной БД и видит свои изменения.
+    """
+
+    replica_actions = ('list', 'retrieve')
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (
+            request.method in SAFE_METHODS
+            and self.action in self.replica_actions
+            and not is_pinned(request.user)
+        ):
+            self.replica_token = use_replicas()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.replica_token is not None:
+            replica_reads.reset(self.replica_token)
+            self.replica_token = None
+        if (
+            request.method not in SAFE_METHODS
+            and request.user.is_authenticated
+            and response.status_code < 400
+        ):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,10 +1,144 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from functools import partial
 
-from core.constants import DEFAULT_PAGINATION
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+from core.constants import (
+    COUNT_CACHE_TIMEOUT,
+    COUNT_ESTIMATE_THRESHOLD,
+    DEFAULT_PAGINATION
+)
+from core.db_routing import fresh_reads
+from recipes.catalog import get_catalog_version
+
+COUNT_KEY = 'count:{}:{}:{}'
+
+
+def estimate_count(queryset):
+    """Оценка числа строк планировщиком PostgreSQL.
+
+    Для выборки без фильтров берётся reltuples таблицы,
+    для остальных - число строк из плана запроса.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            # До первого ANALYZE reltuples равен -1 или 0.
+            return int(row[0]) if row and row[0] > 0 else None
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+
+
+class CountingPaginator(Paginator):
+    """Пагинатор с кэшируемым числом объектов.
+
+    Точное число кэшируется по запросу выборки, версии данных
+    модели и дополнительным версиям versions (например, избранного
+    пользователя, по которому отфильтрована выборка). Большие
+    выборки в PostgreSQL не считаются вовсе: вместо числа отдаётся
+    оценка планировщика.
+    """
+
+    estimated = False
+
+    def __init__(self, *args, versions=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        self.versions = tuple(versions)
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        try:
+            query = str(queryset.order_by().values('pk').query)
+        except EmptyResultSet:
+            return 0
+        versions = (get_catalog_version(queryset.model), *self.versions)
+        key = COUNT_KEY.format(
+            queryset.model._meta.label_lower,
+            ':'.join(map(str, versions)),
+            hashlib.md5(query.encode()).hexdigest()
+        )
+        cached = cache.get(key)
+        if cached is None:
+            count = estimate_count(queryset)
+            estimated = (
+                count is not None and count >= COUNT_ESTIMATE_THRESHOLD
+            )
+            if not estimated:
+                with fresh_reads(*versions):
+                    count = queryset.count()
+            cached = (count, estimated)
+            cache.set(key, cached, COUNT_CACHE_TIMEOUT)
+        count, self.estimated = cached
+        return count
+
+
+class KeysetPagination(CursorPagination):
+    """Пагинация курсором по полям сортировки выборки."""
+
+    page_size = DEFAULT_PAGINATION
+    page_size_query_param = 'limit'
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+    def decode_cursor(self, request):
+        # Пустой cursor открывает первую страницу в режиме курсора.
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
 
 
 class CustomPagination(PageNumberPagination):
-    """Кастомная пагинация."""
+    """Кастомная пагинация.
+
+    С параметром cursor (в том числе пустым) страницы выдаются
+    по курсору: без COUNT и OFFSET, по индексу полей сортировки.
+    Заголовок X-Count-Estimated сообщает, что count - оценка.
+    Дополнительные версии для кэша count отдаёт метод count_versions
+    вьюсета, если он есть.
+    """
 
     page_size = DEFAULT_PAGINATION
     page_size_query_param = 'limit'
+    keyset = None
+    count_versions = ()
+
+    @property
+    def django_paginator_class(self):
+        return partial(CountingPaginator, versions=self.count_versions)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if hasattr(view, 'count_versions'):
+            self.count_versions = view.count_versions()
+        if KeysetPagination.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+        self.keyset = KeysetPagination(
+            queryset.query.order_by or queryset.model._meta.ordering
+        )
+        return self.keyset.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        response = super().get_paginated_response(data)
+        response['X-Count-Estimated'] = str(
+            self.page.paginator.estimated
+        ).lower()
+        return response
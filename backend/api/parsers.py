@@ -0,0 +1,227 @@
+"""Парсеры запросов с изображениями.
+
+Изображение может прийти строкой base64 внутри JSON, файлом
+в multipart-форме или телом запроса целиком. Во всех случаях
+оно пишется на диск по частям и не держится в памяти целиком.
+"""
+import base64
+import binascii
+import codecs
+import json
+import re
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils.datastructures import MultiValueDict
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import (
+    DataAndFiles,
+    FileUploadParser,
+    JSONParser,
+    MultiPartParser
+)
+
+from core.constants import DATA_URI_HEADER_MAX_LENGTH, UPLOAD_CHUNK_SIZE
+
+DATA_URI = re.compile(rb'^data:([\w.+/-]*);base64,')
+STRING_SPECIAL = re.compile(rb'["\\]')
+PLACEHOLDER = '\x00upload:{}'
+
+
+class Base64Decoder:
+    """Потоковое декодирование base64 во временный файл."""
+
+    def __init__(self, content_type):
+        self.file = TemporaryUploadedFile(
+            'upload', content_type, 0, None
+        )
+        self.rest = b''
+
+    def write(self, data):
+        data = self.rest + data
+        end = len(data) - len(data) % 4
+        self.rest = data[end:]
+        self.decode(data[:end])
+
+    def decode(self, data):
+        try:
+            self.file.write(base64.b64decode(data, validate=True))
+        except binascii.Error:
+            raise ParseError('Некорректная строка base64.')
+
+    def close(self):
+        self.decode(self.rest)
+        self.file.size = self.file.tell()
+        self.file.seek(0)
+        return self.file
+
+
+class StreamingJSONParser(JSONParser):
+    """JSON-парсер с потоковым декодированием изображений.
+
+    Строки вида data:<тип>;base64,... не попадают в разбираемый
+    JSON: они декодируются во временные файлы по мере чтения
+    тела запроса, а в данных заменяются на эти файлы.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        self.files = []
+        self.document = bytearray()
+        self.in_string = False
+        self.escape = False
+        self.head = None
+        self.decoder = None
+        while stream is not None:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            self.feed(chunk)
+        if self.in_string:
+            raise ParseError('JSON parse error - незакрытая строка.')
+        try:
+            data = json.loads(codecs.decode(self.document, encoding))
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+        return self.replace_placeholders(data)
+
+    def feed(self, chunk):
+        position = 0
+        while position < len(chunk):
+            if self.escape:
+                position = self.feed_escape(chunk, position)
+            elif not self.in_string:
+                quote = chunk.find(b'"', position)
+                if quote == -1:
+                    self.document += chunk[position:]
+                    return
+                self.document += chunk[position:quote]
+                self.in_string = True
+                self.head = bytearray()
+                position = quote + 1
+            else:
+                position = self.feed_string(chunk, position)
+
+    def feed_string(self, chunk, position):
+        match = STRING_SPECIAL.search(chunk, position)
+        end = match.start() if match else len(chunk)
+        if self.head is not None:
+            end = min(end, position + max(
+                DATA_URI_HEADER_MAX_LENGTH - len(self.head), 0
+            ))
+        self.write_string(chunk[position:end])
+        if end == len(chunk):
+            return end
+        if self.head is not None and (
+            len(self.head) >= DATA_URI_HEADER_MAX_LENGTH
+        ):
+            self.start_long_string()
+            return end
+        if chunk[end:end + 1] == b'\\':
+            self.escape = True
+            return end + 1
+        self.finish_string()
+        return end + 1
+
+    def feed_escape(self, chunk, position):
+        self.escape = False
+        char = chunk[position:position + 1]
+        if char == b'/':
+            # \/ равносилен / и встречается в base64 от кодировщиков,
+            # экранирующих слеш, в том числе в начале data URI.
+            self.write_string(char)
+        elif self.decoder is None:
+            self.write_string(b'\\' + char)
+        else:
+            raise ParseError('Некорректная строка base64.')
+        return position + 1
+
+    def write_string(self, data):
+        if self.decoder is not None:
+            self.decoder.write(data)
+        elif self.head is not None:
+            self.head += data
+        else:
+            self.document += data
+
+    def start_long_string(self):
+        head, self.head = bytes(self.head), None
+        match = DATA_URI.match(head)
+        if match is None:
+            # Длинная строка без изображения остаётся в документе.
+            self.document += b'"' + head
+            return
+        self.decoder = Base64Decoder(match.group(1).decode())
+        self.decoder.write(head[match.end():])
+
+    def finish_string(self):
+        self.in_string = False
+        if self.decoder is not None:
+            self.files.append(self.decoder.close())
+            self.decoder = None
+            placeholder = PLACEHOLDER.format(len(self.files) - 1)
+            self.document += json.dumps(placeholder).encode()
+        elif self.head is not None:
+            self.document += b'"' + self.head + b'"'
+            self.head = None
+        else:
+            self.document += b'"'
+
+    def replace_placeholders(self, data):
+        if isinstance(data, dict):
+            return {
+                key: self.replace_placeholders(value)
+                for key, value in data.items()
+            }
+        if isinstance(data, list):
+            return [self.replace_placeholders(value) for value in data]
+        for index, file in enumerate(self.files):
+            if data == PLACEHOLDER.format(index):
+                return file
+        return data
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """Multipart-парсер для вложенных полей.
+
+    Списки и объекты (ingredients, tags) передаются
+    в полях формы строками JSON. Повторяющиеся поля
+    (tags=1&tags=2) собираются в список.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        data = {}
+        for key, values in result.data.lists():
+            values = [self.parse_value(key, value) for value in values]
+            data[key] = values[0] if len(values) == 1 else values
+        data.update(result.files.items())
+        return DataAndFiles(data, MultiValueDict())
+
+    def parse_value(self, key, value):
+        if value[:1] not in ('[', '{'):
+            return value
+        try:
+            return json.loads(value)
+        except ValueError as exc:
+            raise ParseError(f'{key}: JSON parse error - {exc}')
+
+
+class ImageUploadParser(FileUploadParser):
+    """Изображение телом запроса.
+
+    Файл кладётся в поле, указанное в upload_field вьюсета.
+    """
+
+    media_type = 'image/*'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        result = super().parse(stream, media_type, parser_context)
+        field = getattr(parser_context['view'], 'upload_field', 'file')
+        return DataAndFiles({}, {field: result.files['file']})
+
+    def get_filename(self, stream, media_type, parser_context):
+        return super().get_filename(
+            stream, media_type, parser_context
+        ) or 'upload'
@@ -0,0 +1,56 @@
+import json
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Рендерер простого текста.
+
+    Используется для сообщений об ошибках эндпоинтов,
+    отдающих файлы: сами файлы передаются потоком.
+    """
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict) and 'detail' in data:
+            data = data['detail']
+        if not isinstance(data, str):
+            data = json.dumps(data, ensure_ascii=False)
+        return data.encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    """Рендерер CSV."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSON-рендерер на orjson.
+
+    Вывод побайтно совпадает с JSONRenderer при настройках
+    по умолчанию: компактный JSON без экранирования не-ASCII
+    символов, но с экранированием U+2028 и U+2029.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if indent or self.ensure_ascii or not self.compact:
+            return super().render(
+                data, accepted_media_type, renderer_context
+            )
+        return orjson.dumps(
+            data, default=self.encoder_class().default
+        ).replace(
+            b'\xe2\x80\xa8', b'\\u2028'
+        ).replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
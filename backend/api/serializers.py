@@ -1,7 +1,18 @@
+from django.db import transaction
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from core.constants import MIN_PASSWORD_LENGTH
+from api.fields import ImageVariantsField, UploadImageField
+from core.constants import (
+    AVATAR_IMAGE_SIZES,
+    MIN_PASSWORD_LENGTH,
+    RECIPE_IMAGE_SIZES
+)
+from recipes.cart_totals import (
+    restore_recipe_in_carts,
+    withdraw_recipe_from_carts
+)
+from recipes.catalog import bump_recipe_ingredients_version
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
@@ -11,6 +22,13 @@ from recipes.models import (
     ShoppingCartRecipe,
     Tag
 )
+from recipes.user_state import (
+    FAVORITES,
+    SHOPPING_CART,
+    SUBSCRIPTIONS,
+    UserState,
+    page_ids
+)
 from users.models import User, Subscribe
 
 
@@ -21,6 +39,7 @@ class GetUserSerializer(serializers.ModelSerializer):
         method_name='get_subscribe_status'
     )
     avatar = Base64ImageField()
+    avatar_variants = ImageVariantsField('avatar', AVATAR_IMAGE_SIZES)
 
     class Meta:
         model = User
@@ -32,13 +51,14 @@ class GetUserSerializer(serializers.ModelSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
     def get_subscribe_status(self, author):
-        user = self.context.get('request').user
-        return (
-            user.is_authenticated
-            and user.followings.filter(author=author).exists()
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
+        return UserState.for_request(self.context.get('request')).contains(
+            SUBSCRIPTIONS, author.id, page_ids(self, author)
         )
 
 
@@ -70,11 +90,12 @@ class CreateUserSerializer(serializers.ModelSerializer):
 class AvatarSerializer(serializers.ModelSerializer):
     """Сериализатор аватарки"""
 
-    avatar = Base64ImageField()
+    avatar = UploadImageField()
+    avatar_variants = ImageVariantsField('avatar', AVATAR_IMAGE_SIZES)
 
     class Meta:
         model = User
-        fields = ('avatar',)
+        fields = ('avatar', 'avatar_variants')
 
 
 class GetSubscribeSerializer(GetUserSerializer):
@@ -93,8 +114,14 @@ class GetSubscribeSerializer(GetUserSerializer):
         fields = GetUserSerializer.Meta.fields + ('recipes', 'recipes_count')
 
     def get_recipes(self, author):
-        recipes = author.recipes.all()
         request = self.context.get('request')
+        if hasattr(author, 'latest_recipes'):
+            return GetShortRecipeSerializer(
+                author.latest_recipes,
+                many=True,
+                context={'request': request}
+            ).data
+        recipes = author.recipes.all()
         if 'recipes_limit' in self.context.get('request').GET:
             recipes_limit = self.context.get('request').GET['recipes_limit']
             if recipes_limit.isdigit():
@@ -106,7 +133,7 @@ class GetSubscribeSerializer(GetUserSerializer):
         ).data
 
     def get_recipes_count(self, author):
-        return author.recipes.count()
+        return author.recipes_count
 
 
 class CreateSubscribeSerializer(serializers.ModelSerializer):
@@ -217,6 +244,7 @@ class CreateRecipeIngredientSerializer(serializers.ModelSerializer):
 class GetShortRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор получения краткой информацией Рецепта."""
     image = Base64ImageField()
+    image_variants = ImageVariantsField('image', RECIPE_IMAGE_SIZES)
 
     class Meta:
         model = Recipe
@@ -224,6 +252,7 @@ class GetShortRecipeSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
 
@@ -244,6 +273,7 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         method_name='get_is_in_shopping_cart'
     )
     image = Base64ImageField()
+    image_variants = ImageVariantsField('image', RECIPE_IMAGE_SIZES)
 
     class Meta:
         model = Recipe
@@ -256,22 +286,25 @@ class GetRecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
     def get_is_favorited(self, obj):
-        request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated
-            and request.user.favorite_recipes.filter(recipe=obj).exists()
-        )
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return self.get_user_state_flag(FAVORITES, obj)
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return self.get_user_state_flag(SHOPPING_CART, obj)
+
+    def get_user_state_flag(self, kind, obj):
         request = self.context.get('request')
-        return (
-            request and request.user.is_authenticated
-            and request.user.cart_recipes.filter(recipe=obj).exists()
+        return request and UserState.for_request(request).contains(
+            kind, obj.id, page_ids(self, obj)
         )
 
 
@@ -284,7 +317,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     ingredients = CreateRecipeIngredientSerializer(
         many=True, source='recipe_ingredients'
     )
-    image = Base64ImageField()
+    image = UploadImageField()
 
     class Meta:
         model = Recipe
@@ -348,23 +381,32 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             )
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipe_ingredients')
         recipe = Recipe.objects.create(**validated_data)
         self.add_ingredients(RecipeIngredient, recipe, ingredients)
+        bump_recipe_ingredients_version([recipe.pk])
         recipe.tags.set(tags)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('recipe_ingredients')
         recipe_ingredients = RecipeIngredient.objects.filter(recipe=instance)
         recipe_tags = RecipeTag.objects.filter(recipe=instance)
+        if set(
+            recipe_ingredients.values_list('ingredient_id', flat=True)
+        ) != {ingredient['ingredient'].id for ingredient in ingredients}:
+            bump_recipe_ingredients_version([instance.pk])
+        withdraw_recipe_from_carts(instance)
         recipe_tags.delete()
         recipe_ingredients.delete()
         instance.tags.set(tags)
         self.add_ingredients(RecipeIngredient, instance, ingredients)
+        restore_recipe_in_carts(instance)
 
         return super().update(instance, validated_data)
 
@@ -0,0 +1,143 @@
+"""Потоковая выгрузка списка покупок."""
+import csv
+import json
+from itertools import groupby
+
+from django.db.models import F
+from django.http import StreamingHttpResponse
+
+from core.constants import SHOPPING_CART_CHUNK_SIZE
+from recipes.models import RecipeIngredient, ShoppingCartIngredient
+
+
+def get_ingredients(user):
+    """Суммарное количество каждого Ингридиента в корзине."""
+    return ShoppingCartIngredient.objects.filter(
+        user=user, amount__gt=0
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        ingredient_amount=F('amount'),
+    ).order_by('ingredient__name').iterator(SHOPPING_CART_CHUNK_SIZE)
+
+
+def get_recipes(user):
+    """Ингридиенты корзины, сгруппированные по Рецептам."""
+    rows = RecipeIngredient.objects.filter(
+        recipe__cart_recipes__user=user
+    ).values(
+        'recipe_id',
+        'recipe__name',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount',
+    ).order_by(
+        'recipe__name', 'recipe_id', 'ingredient__name'
+    ).iterator(SHOPPING_CART_CHUNK_SIZE)
+    for (_, name), ingredients in groupby(
+        rows, key=lambda row: (row['recipe_id'], row['recipe__name'])
+    ):
+        yield name, ingredients
+
+
+def export_txt(user, by_recipe):
+    yield 'Список покупок:\n'
+    for ingredient in get_ingredients(user):
+        yield (
+            f'\n{ingredient["ingredient__name"]} - '
+            f'{ingredient["ingredient_amount"]}, '
+            f'{ingredient["ingredient__measurement_unit"]}'
+        )
+    if not by_recipe:
+        return
+    yield '\n\nПо рецептам:'
+    for name, ingredients in get_recipes(user):
+        yield f'\n\n{name}:'
+        for ingredient in ingredients:
+            yield (
+                f'\n{ingredient["ingredient__name"]} - '
+                f'{ingredient["amount"]}, '
+                f'{ingredient["ingredient__measurement_unit"]}'
+            )
+
+
+class Echo:
+    """Буфер, возвращающий записанную строку, для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_csv(user, by_recipe):
+    writer = csv.writer(Echo())
+    header = ['Ингридиент', 'Единицы измерения', 'Количество']
+    yield writer.writerow(['Рецепт', *header] if by_recipe else header)
+    for ingredient in get_ingredients(user):
+        row = [
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['ingredient_amount'],
+        ]
+        yield writer.writerow(['', *row] if by_recipe else row)
+    if not by_recipe:
+        return
+    for name, ingredients in get_recipes(user):
+        for ingredient in ingredients:
+            yield writer.writerow([
+                name,
+                ingredient['ingredient__name'],
+                ingredient['ingredient__measurement_unit'],
+                ingredient['amount'],
+            ])
+
+
+def export_json(user, by_recipe):
+    yield '{"ingredients":['
+    separator = ''
+    for ingredient in get_ingredients(user):
+        yield separator + json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['ingredient_amount'],
+        }, ensure_ascii=False)
+        separator = ','
+    yield ']'
+    if by_recipe:
+        yield ',"recipes":['
+        separator = ''
+        for name, ingredients in get_recipes(user):
+            yield separator + json.dumps({
+                'name': name,
+                'ingredients': [
+                    {
+                        'name': ingredient['ingredient__name'],
+                        'measurement_unit': (
+                            ingredient['ingredient__measurement_unit']
+                        ),
+                        'amount': ingredient['amount'],
+                    }
+                    for ingredient in ingredients
+                ],
+            }, ensure_ascii=False)
+            separator = ','
+        yield ']'
+    yield '}'
+
+
+EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'json': export_json,
+}
+
+
+def shopping_cart_response(user, renderer, by_recipe=False):
+    """Ответ, отдающий список покупок по мере чтения из БД."""
+    response = StreamingHttpResponse(
+        EXPORTERS[renderer.format](user, by_recipe),
+        content_type=f'{renderer.media_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="shopping_list.{renderer.format}"'
+    )
+    return response
@@ -0,0 +1,561 @@
+import base64
+import io
+import json
+import random
+import shutil
+import tempfile
+from contextlib import contextmanager
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.documents import fast_documents, serialized_documents
+from api.renderers import ORJSONRenderer
+from core.constants import DATA_URI_HEADER_MAX_LENGTH
+from core.db_routing import ReplicaRouter
+from recipes.catalog import (
+    get_catalog_version,
+    get_recipe_ingredient_changes,
+    recipe_ingredient_index
+)
+
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCartRecipe,
+    Tag
+)
+from users.models import Subscribe, User
+
+TEST_IMAGE = 'recipes/images/test.png'
+
+
+def create_user(username):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@foodgram.local',
+        first_name=username,
+        last_name=username,
+        password='password'
+    )
+
+
+def png_image():
+    """PNG, base64 которого содержит слеши уже в первых байтах."""
+    image = Image.frombytes('RGB', (64, 64), random.Random(0).randbytes(
+        64 * 64 * 3
+    ))
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def create_recipes(authors, count):
+    """Рецепты авторов по кругу с Тегами и Ингридиентами."""
+    tags = [
+        Tag.objects.get_or_create(name=f'Тег {index}', slug=f'tag-{index}')[0]
+        for index in range(3)
+    ]
+    ingredients = [
+        Ingredient.objects.get_or_create(
+            name=f'Ингридиент {index}', measurement_unit='г'
+        )[0]
+        for index in range(5)
+    ]
+    recipes = []
+    for index in range(count):
+        recipe = Recipe.objects.create(
+            name=f'Рецепт {index}',
+            text=f'Описание рецепта {index}',
+            image=TEST_IMAGE,
+            cooking_time=index + 1,
+            author=authors[index % len(authors)]
+        )
+        RecipeTag.objects.bulk_create(
+            RecipeTag(recipe=recipe, tag=tag)
+            for tag in tags[:index % len(tags) + 1]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=10)
+            for ingredient in ingredients[:index % len(ingredients) + 1]
+        )
+        recipes.append(recipe)
+    return recipes
+
+
+class RecipeListQueriesTest(TestCase):
+    """Число запросов списка Рецептов не зависит от размера страницы."""
+
+    PAGE_SIZES = (1, 6, 20)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        authors = [create_user(f'author{index}') for index in range(4)]
+        recipes = create_recipes(authors, 25)
+        Subscribe.objects.create(user=cls.user, author=authors[0])
+        for recipe in recipes[::2]:
+            FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCartRecipe.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_list_queries(self, client, queries, cached_queries):
+        """Запросы страницы без кэша и с закэшированными документами.
+
+        В PostgreSQL перед count выполняется запрос оценки планировщика.
+        """
+        if connection.vendor == 'postgresql':
+            queries += 1
+        for limit in self.PAGE_SIZES:
+            with self.subTest(limit=limit):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = client.get(f'/api/recipes/?limit={limit}')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), limit)
+                with self.assertNumQueries(cached_queries):
+                    client.get(f'/api/recipes/?limit={limit}')
+
+    def test_anonymous_list(self):
+        self.assert_list_queries(APIClient(), 6, 1)
+
+    def test_authenticated_list(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_list_queries(client, 6, 1)
+
+    @override_settings(RECIPE_FAST_READ_ACTIONS=[])
+    def test_serializer_list(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assert_list_queries(client, 6, 1)
+
+    def test_authenticated_retrieve(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = Recipe.objects.first()
+        with self.assertNumQueries(5):
+            response = client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['is_favorited'])
+
+
+class SubscriptionsTest(TestCase):
+    """Список подписок с ограничением числа Рецептов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.authors = [create_user(f'author{index}') for index in range(2)]
+        create_recipes(cls.authors, 6)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_without_subscriptions(self):
+        response = self.client.get('/api/users/subscriptions/?recipes_limit=3')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_recipes_limit(self):
+        for author in self.authors:
+            Subscribe.objects.create(user=self.user, author=author)
+        response = self.client.get('/api/users/subscriptions/?recipes_limit=2')
+        self.assertEqual(response.status_code, 200)
+        for author in response.json()['results']:
+            self.assertEqual(len(author['recipes']), 2)
+            self.assertEqual(author['recipes_count'], 3)
+
+
+class RecipeUploadTest(TestCase):
+    """Создание Рецепта с изображением в JSON и в multipart-форме."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('author')
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {index}', slug=f'tag-{index}')
+            for index in range(2)
+        ]
+        cls.ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г'
+        )
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.image = png_image()
+
+    def recipe_data(self):
+        return {
+            'name': 'Блины',
+            'text': 'Смешать и пожарить.',
+            'cooking_time': 20,
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 300}],
+        }
+
+    def assert_created(self, response):
+        self.assertEqual(response.status_code, 201, response.content)
+        recipe = Recipe.objects.get(pk=response.json()['id'])
+        with recipe.image.open('rb') as image:
+            self.assertEqual(image.read(), self.image)
+        self.assertEqual(
+            set(recipe.tags.values_list('id', flat=True)),
+            {tag.id for tag in self.tags}
+        )
+
+    def test_json_with_escaped_slashes(self):
+        encoded = base64.b64encode(self.image).decode()
+        self.assertIn('/', encoded[:DATA_URI_HEADER_MAX_LENGTH])
+        body = json.dumps({**self.recipe_data(), 'image': 'IMAGE'}).replace(
+            'IMAGE',
+            'data:image/png;base64,' + encoded.replace('/', '\\/')
+        )
+        self.assert_created(self.client.post(
+            '/api/recipes/', body, content_type='application/json'
+        ))
+
+    def test_multipart_repeated_tags(self):
+        data = self.recipe_data()
+        self.assert_created(self.client.post(
+            '/api/recipes/',
+            {
+                **data,
+                'ingredients': json.dumps(data['ingredients']),
+                'image': SimpleUploadedFile(
+                    'recipe.png', self.image, 'image/png'
+                ),
+            },
+            format='multipart'
+        ))
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'])
+class ReplicaReadTest(TestCase):
+    """Чтение с реплик для безопасных запросов и после записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.recipe = create_recipes([create_user('author')], 3)[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @contextmanager
+    def record_reads(self):
+        """БД, выбранные роутером для чтения; запросы идут в default."""
+        reads = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            if 'instance' not in hints:
+                reads.append(db_for_read(router, model, **hints))
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', record):
+            yield reads
+
+    @mock.patch('core.db_routing.REPLICA_LAG_SECONDS', 0)
+    def test_list_reads_one_replica(self):
+        with self.record_reads() as reads:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(reads)
+        self.assertEqual(len(set(reads)), 1)
+        self.assertIn(reads[0], ('replica_1', 'replica_2'))
+
+    def test_other_actions_read_primary(self):
+        with self.record_reads() as reads:
+            self.client.get(f'/api/recipes/{self.recipe.id}/get-link/')
+        self.assertTrue(reads)
+        self.assertEqual(set(reads), {None})
+
+    def test_reads_pinned_after_write(self):
+        response = self.client.post(f'/api/recipes/{self.recipe.id}/favorite/')
+        self.assertEqual(response.status_code, 201)
+        with self.record_reads() as reads:
+            self.client.get('/api/recipes/')
+        self.assertEqual(set(reads), {None})
+        with self.record_reads() as reads:
+            APIClient().get('/api/recipes/')
+        self.assertNotIn(None, reads)
+
+
+class ReadPathsContractTest(TestCase):
+    """Быстрый путь чтения совпадает с сериализаторами побайтно."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        authors = [create_user(f'author{index}') for index in range(3)]
+        User.objects.filter(pk=authors[0].pk).update(
+            avatar='users/avatar.png',
+            avatar_variants={
+                'source': 'users/avatar.png',
+                'thumbnail': 'users/variants/avatar_thumbnail.png',
+                'thumbnail_webp': 'users/variants/avatar_thumbnail.webp',
+            }
+        )
+        User.objects.filter(pk=authors[1].pk).update(
+            avatar='users/old.png',
+            avatar_variants={'source': 'users/other.png'}
+        )
+        recipes = create_recipes(authors, 12)
+        Recipe.objects.filter(
+            pk__in=[recipe.pk for recipe in recipes[::3]]
+        ).update(
+            image_variants={
+                'source': TEST_IMAGE,
+                'thumbnail': 'recipes/images/variants/test_thumbnail.png',
+                'detail': 'recipes/images/variants/test_detail.png',
+            }
+        )
+        Subscribe.objects.create(user=cls.user, author=authors[0])
+        for recipe in recipes[::2]:
+            FavoriteRecipe.objects.create(user=cls.user, recipe=recipe)
+        for recipe in recipes[::5]:
+            ShoppingCartRecipe.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_documents(self):
+        request = Request(APIRequestFactory().get('/'))
+        request.user = AnonymousUser()
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        expected = {
+            document['id']: document
+            for *_, document in serialized_documents(recipe_ids, request)
+        }
+        documents = {
+            document['id']: document
+            for *_, document in fast_documents(recipe_ids, request)
+        }
+        self.assertEqual(documents.keys(), expected.keys())
+        for recipe_id, document in documents.items():
+            with self.subTest(recipe_id=recipe_id):
+                self.assertEqual(
+                    ORJSONRenderer().render(document),
+                    JSONRenderer().render(expected[recipe_id])
+                )
+
+    def responses(self, client, url):
+        """Ответы сериализаторов и быстрого пути на один запрос."""
+        contents = []
+        for actions in ([], ['list', 'retrieve']):
+            cache.clear()
+            with self.settings(RECIPE_FAST_READ_ACTIONS=actions):
+                response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            contents.append(response.content)
+        return contents
+
+    def test_responses(self):
+        anonymous = APIClient()
+        client = APIClient()
+        client.force_authenticate(self.user)
+        recipe = Recipe.objects.first()
+        for url in ('/api/recipes/?limit=20', f'/api/recipes/{recipe.id}/'):
+            for api_client in (anonymous, client):
+                with self.subTest(url=url, user=api_client is client):
+                    serialized, fast = self.responses(api_client, url)
+                    self.assertEqual(fast, serialized)
+
+    def test_check_read_paths_command(self):
+        call_command('check_read_paths', stdout=io.StringIO())
+
+
+class RecipeIngredientVersionTest(TestCase):
+    """Индекс состава Рецептов обновляется только с набором Ингридиентов.
+
+    Изменённый Рецепт перечитывается в индексе без полной загрузки.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.recipe = create_recipes([cls.author], 1)[0]
+        cls.extra = Ingredient.objects.create(
+            name='Соль', measurement_unit='г'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+        # Варианты изображения строятся в отдельном потоке.
+        patcher = mock.patch('recipes.signals.schedule_image_variants')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def patch_recipe(self, ingredient_ids):
+        changes = get_recipe_ingredient_changes()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                f'/api/recipes/{self.recipe.id}/',
+                {
+                    'name': 'Новое название',
+                    'tags': list(
+                        self.recipe.tags.values_list('id', flat=True)
+                    ),
+                    'ingredients': [
+                        {'id': ingredient_id, 'amount': 5}
+                        for ingredient_id in ingredient_ids
+                    ],
+                },
+                format='json'
+            )
+        self.assertEqual(response.status_code, 200, response.content)
+        return changes, get_recipe_ingredient_changes()
+
+    def test_same_ingredients(self):
+        before, after = self.patch_recipe(
+            self.recipe.recipe_ingredients.values_list(
+                'ingredient_id', flat=True
+            )
+        )
+        self.assertEqual(after, before)
+
+    def test_changed_ingredients(self):
+        old_id = self.recipe.recipe_ingredients.get().ingredient_id
+        self.assertEqual(recipe_ingredient_index.match([self.extra.id]), [])
+        version = get_catalog_version(RecipeIngredient)
+        before, after = self.patch_recipe([old_id, self.extra.id])
+        self.assertEqual(after, before + 1)
+        self.assertEqual(get_catalog_version(RecipeIngredient), version)
+        with mock.patch.object(
+            recipe_ingredient_index, '_load_all'
+        ) as load_all:
+            self.assertEqual(
+                recipe_ingredient_index.match([self.extra.id]),
+                [(self.recipe.id, 0.5)]
+            )
+            self.patch_recipe([self.extra.id])
+            self.assertEqual(recipe_ingredient_index.match([old_id]), [])
+            self.assertEqual(
+                recipe_ingredient_index.match([self.extra.id]),
+                [(self.recipe.id, 1.0)]
+            )
+        load_all.assert_not_called()
+        response = self.client.get(f'/api/recipes/?ingredients={old_id}')
+        self.assertEqual(response.json()['results'], [])
+
+
+class UserVersionsTest(TestCase):
+    """Избранное, корзина и подписки не меняют общих версий."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('reader')
+        cls.author = create_user('author')
+        cls.recipes = create_recipes([cls.author], 3)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def act(self, method, url):
+        """Запись с выполнением колбэков фиксации транзакции."""
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url).status_code
+
+    def count(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['count']
+
+    def test_favorite_keeps_recipe_version(self):
+        version = get_catalog_version(Recipe)
+        self.client.get('/api/recipes/')
+        url = f'/api/recipes/{self.recipes[0].id}/favorite/'
+        self.assertEqual(self.act('post', url), 201)
+        self.assertEqual(get_catalog_version(Recipe), version)
+        self.assertNotEqual(
+            get_catalog_version(FavoriteRecipe, self.user.pk), version
+        )
+
+    def test_filtered_counts(self):
+        for param, name in (
+            ('is_favorited', 'favorite'),
+            ('is_in_shopping_cart', 'shopping_cart'),
+        ):
+            with self.subTest(param=param):
+                url = f'/api/recipes/?{param}=1'
+                action = f'/api/recipes/{self.recipes[0].id}/{name}/'
+                self.assertEqual(self.count(url), 0)
+                self.assertEqual(self.act('post', action), 201)
+                self.assertEqual(self.count(url), 1)
+                self.assertEqual(self.act('delete', action), 204)
+                self.assertEqual(self.count(url), 0)
+
+    def test_subscriptions_count(self):
+        version = get_catalog_version(User)
+        url = '/api/users/subscriptions/'
+        self.assertEqual(self.count(url), 0)
+        action = f'/api/users/{self.author.id}/subscribe/'
+        self.assertEqual(self.act('post', action), 201)
+        self.assertEqual(self.count(url), 1)
+        self.assertEqual(self.act('delete', action), 204)
+        self.assertEqual(self.count(url), 0)
+        self.assertEqual(get_catalog_version(User), version)
+
+
+class IngredientMatchTest(TestCase):
+    """Подбор по Ингридиентам не обрезается лимитом ранжирования."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = create_recipes([create_user('author')], 6)
+        cls.ingredients = list(Ingredient.objects.order_by('name'))
+
+    def setUp(self):
+        cache.clear()
+
+    def get_ids(self, query):
+        response = self.client.get(f'/api/recipes/?{query}')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['count'], len(data['results']))
+        return [recipe['id'] for recipe in data['results']]
+
+    @mock.patch('api.filters.INGREDIENT_MATCH_LIMIT', 2)
+    def test_all_matches_past_limit(self):
+        ids = self.get_ids(f'ingredients={self.ingredients[0].id}')
+        self.assertEqual(len(ids), 6)
+        # Первыми идут Рецепты из одного этого Ингридиента.
+        self.assertEqual(
+            set(ids[:2]), {self.recipes[0].id, self.recipes[5].id}
+        )
+
+    @mock.patch('api.filters.INGREDIENT_MATCH_LIMIT', 2)
+    def test_exclude_past_limit(self):
+        ids = self.get_ids(
+            f'ingredients={self.ingredients[0].id}'
+            f'&exclude_ingredients={self.ingredients[4].id}'
+        )
+        self.assertEqual(len(ids), 5)
+        self.assertNotIn(self.recipes[4].id, ids)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
@@ -22,6 +23,30 @@ api_v1_urls = [
     path('auth/', include('djoser.urls.authtoken')),
 ]
 
+if settings.ASYNC_VIEWS:
+    from api import async_views
+
+    # Маршруты идут раньше маршрутов роутера и перекрывают их.
+    api_v1_urls = [
+        path('tags/', async_views.tag_list, name='tag-list'),
+        path('tags/<int:pk>/', async_views.tag_detail, name='tag-detail'),
+        path(
+            'ingredients/',
+            async_views.ingredient_list,
+            name='ingredient-list'
+        ),
+        path(
+            'ingredients/<int:pk>/',
+            async_views.ingredient_detail,
+            name='ingredient-detail'
+        ),
+        path(
+            'recipes/<int:pk>/',
+            async_views.recipe_detail,
+            name='recipe-detail'
+        ),
+    ] + api_v1_urls
+
 urlpatterns = [
     path('', include(api_v1_urls))
 ]
@@ -1,18 +1,39 @@
-import uuid
-
-from django.db.models import Sum
-from django.http import HttpResponse
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    BooleanField,
+    Exists,
+    OuterRef,
+    Prefetch,
+    Value,
+    prefetch_related_objects
+)
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse
+from django.utils.decorators import method_decorator
 from djoser.views import UserViewSet as DjoserViewSer
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import filters, viewsets, status
+from rest_framework import filters, serializers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
+from api.cache import cache_catalog_response
+from api.documents import recipe_documents
 from api.filters import IngredientFilterSet, RecipeFilterSet
-from api.pagination import CustomPagination
+from api.mixins import ReplicaReadMixin
+from api.pagination import CustomPagination, KeysetPagination
+from api.parsers import (
+    ImageUploadParser,
+    MultiPartJSONParser,
+    StreamingJSONParser
+)
 from api.permissions import IsAuthorOrReadOnly
+from api.renderers import CSVRenderer, ORJSONRenderer, PlainTextRenderer
 from api.serializers import (
     AvatarSerializer,
     ShoppingCartRecipeSerializer,
@@ -26,12 +47,21 @@ from api.serializers import (
     IngredientSerializer,
     TagSerializer,
 )
-from core.constants import SHORT_LINK_MAX_POSTFIX, URL
+from api.shopping_cart import shopping_cart_response
+from core.constants import (
+    DEFAULT_TRENDING_WINDOW,
+    SHORT_LINK_CACHE_SIZE,
+    TRENDING_WINDOWS,
+    URL
+)
+from recipes.catalog import get_catalog_version, ingredient_index
+from recipes.feed import pull_feed
+from recipes.short_links import decode_short_link, encode_short_link
+from recipes.trending import trending_recipe_ids
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
     Recipe,
-    RecipeIngredient,
     ShoppingCartRecipe,
     Tag
 )
@@ -39,12 +69,13 @@ from users.models import User, Subscribe
 
 
 # Вьюсеты пользователя.
-class UserViewSet(DjoserViewSer):
+class UserViewSet(ReplicaReadMixin, DjoserViewSer):
     """Вьюсет создания кастомного пользователя."""
 
     queryset = User.objects.all()
     serializer_class = CreateUserSerializer
     pagination_class = CustomPagination
+    upload_field = 'avatar'
 
     def get_serializer_class(self):
         if (
@@ -55,6 +86,23 @@ class UserViewSet(DjoserViewSer):
             return GetUserSerializer
         return super().get_serializer_class()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if self.action in ('list', 'retrieve') and user.is_authenticated:
+            queryset = queryset.annotate(
+                is_subscribed=Exists(
+                    Subscribe.objects.filter(user=user, author=OuterRef('pk'))
+                )
+            )
+        return queryset
+
+    def count_versions(self):
+        """Версии данных пользователя для кэша count подписок."""
+        if self.action != 'get_subscriptions':
+            return ()
+        return (get_catalog_version(Subscribe, self.request.user.pk),)
+
     @action(
         methods=['get'],
         detail=False,
@@ -75,7 +123,10 @@ class UserViewSet(DjoserViewSer):
         detail=False,
         permission_classes=[IsAuthenticated],
         url_path='me/avatar',
-        url_name='avatar'
+        url_name='avatar',
+        parser_classes=[
+            StreamingJSONParser, MultiPartJSONParser, ImageUploadParser
+        ]
     )
     def avatar(self, request):
         """Редактирование аватара."""
@@ -96,6 +147,7 @@ class UserViewSet(DjoserViewSer):
         url_path=r'(?P<id>\d+)/subscribe',
         url_name='subscribe',
     )
+    @transaction.atomic
     def subscribe(self, request, id):
         """Управление подпиской."""
         user = self.request.user
@@ -130,10 +182,22 @@ class UserViewSet(DjoserViewSer):
     def get_subscriptions(self, request):
         """Получения списка подписок."""
         user = self.request.user
-        subscribes = User.objects.filter(author__user=user)
+        subscribes = User.objects.filter(author__user=user).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by('username')
         paginator = CustomPagination()
         result_pages = paginator.paginate_queryset(
-            queryset=subscribes, request=request
+            queryset=subscribes, request=request, view=self
+        )
+        recipes = Recipe.objects.all()
+        recipes_limit = request.query_params.get('recipes_limit', '')
+        if recipes_limit.isdigit():
+            recipes = Recipe.objects.latest_per_author(
+                result_pages, int(recipes_limit)
+            )
+        prefetch_related_objects(
+            result_pages,
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
         )
         serializer = GetSubscribeSerializer(
             result_pages, context={'request': request}, many=True
@@ -142,7 +206,10 @@ class UserViewSet(DjoserViewSer):
 
 
 # Вьюсеты рецепта.
+@method_decorator(cache_catalog_response(Tag), name='list')
+@method_decorator(cache_catalog_response(Tag), name='retrieve')
 class TagViewSet(
+    ReplicaReadMixin,
     viewsets.ReadOnlyModelViewSet
 ):
     """Вьюсет Тега."""
@@ -152,7 +219,10 @@ class TagViewSet(
     pagination_class = None
 
 
+@method_decorator(cache_catalog_response(Ingredient), name='list')
+@method_decorator(cache_catalog_response(Ingredient), name='retrieve')
 class IngredientViewSet(
+    ReplicaReadMixin,
     viewsets.ReadOnlyModelViewSet
 ):
     """Вьюсет Ингридиента."""
@@ -164,8 +234,18 @@ class IngredientViewSet(
     search_fields = ('^name',)
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = (
+            request.query_params.get('name')
+            or request.query_params.get('search')
+        )
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name))
+
 
 class RecipeViewSet(
+    ReplicaReadMixin,
     viewsets.ModelViewSet,
 ):
     """Вьюсет Рецепта."""
@@ -173,8 +253,61 @@ class RecipeViewSet(
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = CustomPagination
+    parser_classes = (StreamingJSONParser, MultiPartJSONParser)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilterSet
+    replica_actions = ('list', 'retrieve', 'trending')
+
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            return Recipe.objects.with_versions(self.request.user)
+        if self.request.method in SAFE_METHODS:
+            return Recipe.objects.with_related(self.request.user)
+        return super().get_queryset()
+
+    def count_versions(self):
+        """Версии избранного и корзины пользователя для кэша count.
+
+        Нужны только выборкам, отфильтрованным по ним.
+        """
+        user = self.request.user
+        if not user.is_authenticated:
+            return ()
+        return tuple(
+            get_catalog_version(model, user.pk)
+            for param, model in (
+                ('is_favorited', FavoriteRecipe),
+                ('is_in_shopping_cart', ShoppingCartRecipe),
+            )
+            if param in self.request.query_params
+        )
+
+    @property
+    def fast_read(self):
+        """Чтение без сериализаторов, с рендерингом через orjson."""
+        return self.action in settings.RECIPE_FAST_READ_ACTIONS
+
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        if not self.fast_read:
+            return renderers
+        return [
+            ORJSONRenderer() if type(renderer) is JSONRenderer else renderer
+            for renderer in renderers
+        ]
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        return self.get_paginated_response(
+            recipe_documents(page, request, self.fast_read)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return Response(recipe_documents(
+            [self.get_object()], request, self.fast_read
+        )[0])
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -190,12 +323,10 @@ class RecipeViewSet(
         detail=True
     )
     def get_short_link(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-        if not recipe.short_link:
-            recipe.short_link = self.generate_short_link()
-            recipe.save()
+        recipe = get_object_or_404(Recipe.objects.only('short_link'), id=pk)
+        code = recipe.short_link or encode_short_link(recipe.id)
         return Response(
-            {"short-link": recipe.short_link},
+            {"short-link": f'{URL}{code}/'},
             status=status.HTTP_200_OK
         )
 
@@ -234,6 +365,7 @@ class RecipeViewSet(
             request=request
         )
 
+    @transaction.atomic
     def add_recipe_to_favorite_or_cart(
             self,
             serializer,
@@ -264,59 +396,89 @@ class RecipeViewSet(
         detail=False,
         methods=['get'],
         permission_classes=[IsAuthenticated],
+        url_path='feed',
+        url_name='feed'
+    )
+    def feed(self, request):
+        """Лента рецептов авторов из подписок, листается курсором."""
+        pull_feed(request.user)
+        paginator = KeysetPagination(('-feed_created_at', '-id'))
+        page = paginator.paginate_queryset(
+            Recipe.objects.with_versions(request.user).in_feed(request.user),
+            request,
+            self
+        )
+        return paginator.get_paginated_response(
+            recipe_documents(page, request, self.fast_read)
+        )
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='trending',
+        url_name='trending'
+    )
+    def trending(self, request):
+        """Рецепты с наибольшим числом добавлений за окно window.
+
+        Читается рассчитанный командой compact_trending топ.
+        """
+        window = request.query_params.get('window', DEFAULT_TRENDING_WINDOW)
+        if window not in TRENDING_WINDOWS:
+            raise serializers.ValidationError({
+                'window': [
+                    f'Допустимые значения: {", ".join(TRENDING_WINDOWS)}.'
+                ]
+            })
+        recipe_ids = trending_recipe_ids(window)
+        recipes = Recipe.objects.with_versions(request.user).in_bulk(
+            recipe_ids
+        )
+        return Response(recipe_documents(
+            [recipes[pk] for pk in recipe_ids if pk in recipes],
+            request,
+            self.fast_read
+        ))
+
+    @action(
+        detail=False,
+        methods=['get'],
+        permission_classes=[IsAuthenticated],
+        renderer_classes=[PlainTextRenderer, CSVRenderer, JSONRenderer],
         url_path='download_shopping_cart'
     )
     def download_shopping_cart(self, request):
-        """Отправка файла со списком покупок."""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__cart_recipes__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            ingredient_amount=Sum('amount')
-        ).order_by('ingredient__name')
-        shopping_list = self.prepare_ingredients_for_download(ingredients)
-        return self.download_ingredients(shopping_list)
-
-    def prepare_ingredients_for_download(self, ingredients):
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['ingredient_amount']
-            shopping_list.append(f'\n{name} - {amount}, {unit}')
-
-        return shopping_list
-
-    def download_ingredients(self, shopping_list):
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = (
-            'attachment; filename="shopping_list.txt"'
+        """Отправка файла со списком покупок.
+
+        Формат выбирается параметром format (txt, csv или json),
+        разбивка по рецептам включается параметром by_recipe.
+        """
+        by_recipe = request.query_params.get('by_recipe', '').lower() in (
+            '1', 'true'
         )
-        return response
-
-    def generate_short_link(self):
-        """Генератор короткой ссылки."""
-        while True:
-            short_link = (
-                URL + str(
-                    uuid.uuid4()
-                ).replace('-', '')[:SHORT_LINK_MAX_POSTFIX] + '/'
-            )
-            has_short_link = Recipe.objects.filter(
-                short_link=short_link
-            ).exists()
-            if not has_short_link:
-                break
-        return short_link
+        return shopping_cart_response(
+            request.user, request.accepted_renderer, by_recipe
+        )
+
+
+@lru_cache(maxsize=SHORT_LINK_CACHE_SIZE)
+def resolve_short_link(code):
+    """Адрес рецепта по коду короткой ссылки.
+
+    Коды, выданные до перехода на коды из id рецепта,
+    ищутся в БД по индексированному полю short_link.
+    """
+    recipe_id = decode_short_link(code)
+    if recipe_id is None:
+        recipe_id = Recipe.objects.filter(
+            short_link=code
+        ).values_list('id', flat=True).first()
+    if recipe_id is None:
+        raise Http404('Рецепт не найден.')
+    return reverse('api:recipe-detail', kwargs={'pk': recipe_id})
 
 
 def redirect_to_recipe_detail(request, short_link):
     """Редирект с короткой ссылки."""
 
-    link = request.build_absolute_uri()
-    recipe = get_object_or_404(Recipe, short_link=link)
-    return redirect(
-        'api:recipe-detail',
-        pk=recipe.id
-    )
+    return redirect(resolve_short_link(short_link))
@@ -0,0 +1,32 @@
+"""Ограниченный пул потоков для синхронной работы с БД из async-кода."""
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from core.constants import ASYNC_DB_WORKERS
+
+executor = ThreadPoolExecutor(
+    max_workers=ASYNC_DB_WORKERS,
+    thread_name_prefix='async-db'
+)
+
+
+def run_with_connections(func, *args, **kwargs):
+    """Вызов с закрытием устаревших соединений потока пула."""
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_db_pool(func, *args, **kwargs):
+    """Выполнение синхронной функции в пуле, не блокируя цикл событий.
+
+    Число одновременных обращений к БД из процесса
+    не превышает размера пула.
+    """
+    return await sync_to_async(
+        run_with_connections, thread_sensitive=False, executor=executor
+    )(func, *args, **kwargs)
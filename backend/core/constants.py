@@ -15,6 +15,7 @@ MAX_TAG_SLUG_LENGTH = 32
 MAX_INGREDIENT_NAME_LENGTH = 128
 MAX_INGREDIENT_MEASUREMENT_UNIT_LENGTH = 64
 MIN_INGREDIENT_AMOUNT = 1
+MAX_INGREDIENT_SEARCH_RESULTS = 50
 
 # Константы Рецепта.
 MAX_RECIPE_LINK_LENGTH = 256
@@ -22,8 +23,48 @@ MAX_RECIPE_NAME_LENGTH = 256
 MAX_COCKING_TIME = 1440
 MIN_COCKING_TIME = 1
 
+# Константы трендов: окно -> длительность в часах.
+TRENDING_WINDOWS = {
+    '24h': 24,
+    '7d': 24 * 7,
+}
+DEFAULT_TRENDING_WINDOW = '24h'
+MAX_TRENDING_WINDOW_LENGTH = 8
+TRENDING_SIZE = 50
+TRENDING_HOURLY_PERIOD_HOURS = 24
+
+# Константы изображений.
+RECIPE_IMAGE_SIZES = {
+    'thumbnail': (480, 480),
+    'detail': (1200, 1200),
+}
+AVATAR_IMAGE_SIZES = {
+    'thumbnail': (160, 160),
+}
+IMAGE_PROCESSING_WORKERS = 2
+UPLOAD_CHUNK_SIZE = 64 * 1024
+DATA_URI_HEADER_MAX_LENGTH = 256
+
 # Общие константы
 MAX_VIEW_LENGTH = 30
 URL = 'https://soulscavengerkitty.ddns.net/s/'
-SHORT_LINK_MAX_POSTFIX = 10
+SHORT_LINK_CHECKSUM_LENGTH = 3
+SHORT_LINK_CACHE_SIZE = 10_000
 DEFAULT_PAGINATION = 6
+COUNT_CACHE_TIMEOUT = 60
+COUNT_ESTIMATE_THRESHOLD = 100_000
+USER_STATE_CACHE_TIMEOUT = 60 * 60
+RECIPE_DOCUMENT_CACHE_TIMEOUT = 60 * 60 * 24
+REPLICA_LAG_SECONDS = 5
+ASYNC_DB_WORKERS = 8
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_CART_CHUNK_SIZE = 500
+SEARCH_CONFIG = 'russian'
+INGREDIENT_MATCH_LIMIT = 1000
+RECIPE_INGREDIENT_INDEX_CHUNK_SIZE = 10_000
+RECIPE_INGREDIENT_MAX_DELTAS = 1000
+RECIPE_INGREDIENT_DELTA_TIMEOUT = 60 * 60
+FEED_FANOUT_LIMIT = 10_000
+FEED_BACKFILL_SIZE = 50
+FEED_PULL_OVERLAP = 60
+FEED_PULL_CACHE_TIMEOUT = 60 * 60 * 24 * 7
@@ -0,0 +1,84 @@
+"""Чтение с реплик БД.
+
+Запросы на чтение уходят на реплики только внутри помеченных
+участков кода: безопасных запросов к отдельным эндпоинтам.
+Реплика выбирается один раз на запрос, чтобы все его чтения
+видели одно состояние данных. Всё остальное, включая запись,
+идёт в основную БД.
+"""
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.constants import REPLICA_LAG_SECONDS
+
+PIN_KEY = 'db-pin:{}'
+
+# Реплика для чтения в текущем запросе или None для основной БД.
+replica_reads = ContextVar('replica_reads', default=None)
+
+
+def use_replicas():
+    """Выбор реплики для чтения; возвращает токен для сброса."""
+    replicas = settings.DATABASE_REPLICAS
+    return replica_reads.set(random.choice(replicas) if replicas else None)
+
+
+@contextmanager
+def primary_reads():
+    """Чтение из основной БД внутри блока."""
+    token = replica_reads.set(None)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def fresh_reads(*versions):
+    """Чтение из основной БД, если данные менялись недавно.
+
+    Используется там, где прочитанное кэшируется под версией:
+    отстающая реплика не должна попасть в кэш под новой версией.
+    """
+    if any(time.time() - version < REPLICA_LAG_SECONDS
+           for version in versions):
+        return primary_reads()
+    return nullcontext()
+
+
+def pin_to_primary(user):
+    """Чтение пользователя из основной БД после его записи."""
+    cache.set(PIN_KEY.format(user.pk), True, REPLICA_LAG_SECONDS)
+
+
+def is_pinned(user):
+    return bool(
+        user.is_authenticated and cache.get(PIN_KEY.format(user.pk))
+    )
+
+
+class ReplicaRouter:
+    """Роутер: чтение с реплик в помеченных участках, запись в default.
+
+    Связанные объекты читаются из той же БД, что и объект,
+    через который к ним обращаются.
+    """
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return replica_reads.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
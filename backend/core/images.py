@@ -0,0 +1,125 @@
+"""Фоновая подготовка уменьшенных вариантов изображений.
+
+Варианты строятся в пуле потоков после фиксации транзакции,
+а их пути сохраняются в JSON-поле <поле изображения>_variants.
+"""
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.constants import IMAGE_PROCESSING_WORKERS
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIRECTORY = 'variants'
+WEBP_SUFFIX = '_webp'
+
+executor = ThreadPoolExecutor(
+    max_workers=IMAGE_PROCESSING_WORKERS,
+    thread_name_prefix='image-variants'
+)
+
+
+def variant_names(sizes):
+    """Имена вариантов: каждый размер в исходном формате и в WebP."""
+    return [
+        name + suffix for name in sizes for suffix in ('', WEBP_SUFFIX)
+    ]
+
+
+def is_processed(instance, field_name):
+    """Построены ли варианты для текущего изображения."""
+    image = getattr(instance, field_name)
+    variants = getattr(instance, f'{field_name}_variants') or {}
+    return bool(image) and variants.get('source') == image.name
+
+
+def schedule_image_variants(instance, field_name, sizes):
+    """Постановка построения вариантов в очередь после коммита."""
+    if not getattr(instance, field_name) or is_processed(
+        instance, field_name
+    ):
+        return
+    model = type(instance)
+    pk = instance.pk
+    transaction.on_commit(
+        lambda: executor.submit(
+            build_in_background, model, pk, field_name, sizes
+        )
+    )
+
+
+def build_in_background(model, pk, field_name, sizes):
+    """Задача пула: построение вариантов с закрытием соединения с БД."""
+    try:
+        build_image_variants(model, pk, field_name, sizes)
+    except Exception:
+        logger.exception(
+            'Не удалось построить варианты изображения %s %s', model, pk
+        )
+    finally:
+        close_old_connections()
+
+
+def encode(image, image_format):
+    buffer = BytesIO()
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.save(buffer, image_format, quality=85)
+    return buffer.getvalue()
+
+
+def build_image_variants(model, pk, field_name, sizes):
+    """Построение вариантов изображения и сохранение их путей."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or is_processed(instance, field_name):
+        return
+    image_file = getattr(instance, field_name)
+    storage = image_file.storage
+    with image_file.open('rb') as file:
+        original = ImageOps.exif_transpose(Image.open(file))
+        original.load()
+    has_alpha = 'A' in original.getbands()
+    image_format, extension = ('PNG', 'png') if has_alpha else ('JPEG', 'jpg')
+    directory, filename = posixpath.split(image_file.name)
+    stem = posixpath.splitext(filename)[0]
+    variants = {'source': image_file.name}
+    for name, size in sizes.items():
+        resized = original.copy()
+        resized.thumbnail(size)
+        for suffix, variant_format, variant_extension in (
+            ('', image_format, extension),
+            (WEBP_SUFFIX, 'WEBP', 'webp'),
+        ):
+            variants[name + suffix] = storage.save(
+                posixpath.join(
+                    directory,
+                    VARIANTS_DIRECTORY,
+                    f'{stem}_{name}.{variant_extension}'
+                ),
+                ContentFile(encode(resized, variant_format))
+            )
+    values = {f'{field_name}_variants': variants}
+    if any(
+        field.name == 'updated_at' for field in model._meta.concrete_fields
+    ):
+        # Новые ссылки меняют документ объекта в кэше.
+        values['updated_at'] = timezone.now()
+    updated = model.objects.filter(
+        pk=pk, **{field_name: image_file.name}
+    ).update(**values)
+    # Если изображение успели заменить, удаляются только что
+    # построенные варианты, иначе - варианты прежнего изображения.
+    stale = (
+        getattr(instance, f'{field_name}_variants') or {}
+        if updated else variants
+    )
+    for name in variant_names(sizes):
+        if stale.get(name):
+            storage.delete(stale[name])
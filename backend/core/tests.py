@@ -0,0 +1,61 @@
+from django.test import SimpleTestCase, override_settings
+
+from core.db_routing import (
+    ReplicaRouter,
+    primary_reads,
+    replica_reads,
+    use_replicas
+)
+from recipes.models import Recipe
+
+REPLICAS = ['replica_1', 'replica_2']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTest(SimpleTestCase):
+    """Выбор БД роутером ReplicaRouter."""
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_primary_by_default(self):
+        self.assertIsNone(self.router.db_for_read(Recipe))
+        self.assertEqual(self.router.db_for_write(Recipe), 'default')
+
+    def test_one_replica_per_request(self):
+        token = use_replicas()
+        try:
+            replica = replica_reads.get()
+            self.assertIn(replica, REPLICAS)
+            for _ in range(20):
+                self.assertEqual(self.router.db_for_read(Recipe), replica)
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+            with primary_reads():
+                self.assertIsNone(self.router.db_for_read(Recipe))
+            self.assertEqual(self.router.db_for_read(Recipe), replica)
+        finally:
+            replica_reads.reset(token)
+        self.assertIsNone(self.router.db_for_read(Recipe))
+
+    def test_instance_database(self):
+        recipe = Recipe()
+        recipe._state.db = 'replica_2'
+        self.assertEqual(
+            self.router.db_for_read(Recipe, instance=recipe), 'replica_2'
+        )
+        token = use_replicas()
+        try:
+            recipe._state.db = 'default'
+            self.assertEqual(
+                self.router.db_for_read(Recipe, instance=recipe), 'default'
+            )
+        finally:
+            replica_reads.reset(token)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        token = use_replicas()
+        try:
+            self.assertIsNone(self.router.db_for_read(Recipe))
+        finally:
+            replica_reads.reset(token)
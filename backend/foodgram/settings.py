@@ -12,8 +12,21 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = os.getenv('SECRET_KEY', get_random_secret_key())
 
+# Ключ подписи коротких ссылок; при его смене старые ссылки
+# перестают открываться.
+SHORT_LINK_SECRET = os.getenv('SHORT_LINK_SECRET') or SECRET_KEY
+
 DEBUG = os.getenv('DEBUG', '').lower() == 'true'
 
+USER_STATE_CACHE = os.getenv('USER_STATE_CACHE', '').lower() == 'true'
+
+# Асинхронные представления лёгких эндпоинтов при запуске через ASGI.
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '').lower() == 'true'
+
+RECIPE_FAST_READ_ACTIONS = os.getenv(
+    'RECIPE_FAST_READ_ACTIONS', 'list retrieve'
+).split()
+
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '127.0.0.1 localhost').split(' ')
 
 INSTALLED_APPS = [
@@ -74,6 +87,29 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: хосты через пробел, остальные параметры
+# подключения совпадают с основной БД.
+DATABASE_REPLICAS = []
+for number, host in enumerate(os.getenv('DB_REPLICA_HOSTS', '').split(), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -107,6 +143,7 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 PATH_TO_INGREDIENTS = BASE_DIR / 'data/ingredients.json'
+PATH_TO_INGREDIENTS_CSV = BASE_DIR / 'data/ingredients.csv'
 PATH_TO_TAGS = BASE_DIR / 'data/tags.json'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
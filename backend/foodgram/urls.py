@@ -1,8 +1,11 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
-from api.views import redirect_to_recipe_detail
-
+if settings.ASYNC_VIEWS:
+    from api.async_views import redirect_to_recipe_detail
+else:
+    from api.views import redirect_to_recipe_detail
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -0,0 +1,19 @@
+"""Воркер gunicorn для запуска приложения через ASGI."""
+import os
+
+from uvicorn.workers import UvicornWorker
+
+
+class AsyncWorker(UvicornWorker):
+    """Воркер uvicorn с ограничением числа одновременных соединений.
+
+    При превышении лимита новые запросы получают ответ 503,
+    а не ждут в очереди пула потоков БД.
+    """
+
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        'limit_concurrency': int(
+            os.getenv('ASGI_LIMIT_CONCURRENCY', 4096)
+        ),
+    }
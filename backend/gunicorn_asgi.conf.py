@@ -0,0 +1,35 @@
+"""Конфигурация gunicorn для запуска в режиме ASGI.
+
+gunicorn -c gunicorn_asgi.conf.py foodgram.asgi:application
+"""
+import os
+
+from dotenv import find_dotenv, load_dotenv
+
+load_dotenv(find_dotenv())
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+# LocMemCache у каждого процесса свой: смена версий и сброс кэшей
+# в одном воркере не видны остальным, поэтому без общего кэша
+# (CACHE_BACKEND) запускается один воркер.
+SHARED_CACHE = (
+    os.getenv('CACHE_BACKEND', LOCAL_CACHE_BACKEND) != LOCAL_CACHE_BACKEND
+)
+
+bind = '0.0.0.0:9000'
+worker_class = 'foodgram.workers.AsyncWorker'
+workers = int(os.getenv('GUNICORN_WORKERS', 2 if SHARED_CACHE else 1))
+backlog = 4096
+keepalive = 75
+timeout = 60
+graceful_timeout = 30
+
+
+def on_starting(server):
+    """Отказ запускать несколько воркеров с кэшем в памяти процесса."""
+    if server.cfg.workers > 1 and not SHARED_CACHE:
+        raise RuntimeError(
+            f'Воркеров: {server.cfg.workers}, но CACHE_BACKEND не задан: '
+            'с LocMemCache кэши воркеров расходятся. Задайте общий кэш '
+            '(CACHE_BACKEND, CACHE_LOCATION) или GUNICORN_WORKERS=1.'
+        )
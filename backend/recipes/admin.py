@@ -1,14 +1,25 @@
+from contextlib import contextmanager
+
 from django.contrib import admin
+from django.db import transaction
+from django.utils import timezone
 
+from recipes.cart_totals import (
+    restore_recipe_in_carts,
+    withdraw_recipe_from_carts
+)
+from recipes.catalog import bump_recipe_ingredients_version
 from recipes.models import (
     FavoriteRecipe,
     Ingredient,
     Recipe,
     RecipeIngredient,
     RecipeTag,
+    ShoppingCartIngredient,
     ShoppingCartRecipe,
     Tag
 )
+from recipes.search import update_search_vectors
 
 
 class BaseFavoriteShopping(admin.ModelAdmin):
@@ -66,6 +77,18 @@ class RecipeAdmin(admin.ModelAdmin):
     filter_horizontal = ('tags',)
     inlines = [RecipeIngredientInline, RecipeTagInline]
 
+    def save_related(self, request, form, formsets, change):
+        if change:
+            withdraw_recipe_from_carts(form.instance)
+        super().save_related(request, form, formsets, change)
+        if change:
+            restore_recipe_in_carts(form.instance)
+        if any(
+            formset.model is RecipeIngredient and formset.has_changed()
+            for formset in formsets
+        ):
+            bump_recipe_ingredients_version([form.instance.pk])
+
     @admin.display(
         description='Автор,'
     )
@@ -94,7 +117,7 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     def added_to_favorite(self, object):
         """Популярность рецепта."""
-        return object.favorite_recipes.count()
+        return object.favorites_count
 
 
 @admin.register(Tag)
@@ -138,8 +161,45 @@ class IngredientAdmin(admin.ModelAdmin):
     list_filter = ('name',)
 
 
+class RecipePartAdmin(admin.ModelAdmin):
+    """Базовый класс для Ингридиентов/Тегов Рецепта.
+
+    Изменение части Рецепта меняет его версию для кэша документов
+    и пересчитывает его поисковый вектор.
+    """
+
+    def touch_recipes(self, recipe_ids):
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            updated_at=timezone.now()
+        )
+        update_search_vectors(recipe_ids)
+
+    @contextmanager
+    def changing_recipes(self, recipe_ids):
+        """Изменение частей Рецептов recipe_ids внутри блока."""
+        yield
+
+    def save_model(self, request, obj, form, change):
+        # Строку могли перенести в другой Рецепт: меняются оба.
+        recipe_ids = list({obj.recipe_id, form.initial.get('recipe')} - {None})
+        with self.changing_recipes(recipe_ids):
+            super().save_model(request, obj, form, change)
+        self.touch_recipes(recipe_ids)
+
+    def delete_model(self, request, obj):
+        with self.changing_recipes([obj.recipe_id]):
+            super().delete_model(request, obj)
+        self.touch_recipes([obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe_id', flat=True))
+        with self.changing_recipes(recipe_ids):
+            super().delete_queryset(request, queryset)
+        self.touch_recipes(recipe_ids)
+
+
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(RecipePartAdmin):
     """Админка Рецепта/Ингридиента."""
 
     list_display = (
@@ -152,9 +212,24 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     search_fields = ('recipe__name', 'ingredient__name')
     list_display_links = ('recipe', 'ingredient')
 
+    @contextmanager
+    def changing_recipes(self, recipe_ids):
+        """Пересчёт корзин с изменяемыми Рецептами, как в RecipeAdmin."""
+        recipes = list(Recipe.objects.filter(pk__in=recipe_ids).only('pk'))
+        with transaction.atomic():
+            for recipe in recipes:
+                withdraw_recipe_from_carts(recipe)
+            yield
+            for recipe in recipes:
+                restore_recipe_in_carts(recipe)
+
+    def touch_recipes(self, recipe_ids):
+        super().touch_recipes(recipe_ids)
+        bump_recipe_ingredients_version(recipe_ids)
+
 
 @admin.register(RecipeTag)
-class RecipeTagAdmin(admin.ModelAdmin):
+class RecipeTagAdmin(RecipePartAdmin):
     """Админка Рецепта/Тега."""
 
     list_display = (
@@ -177,4 +252,18 @@ class ShoppingCartAdmin(BaseFavoriteShopping):
     """Админка Списка Покупок."""
 
 
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    """Админка суммарных количеств Ингридиентов в корзинах."""
+
+    list_display = (
+        'user',
+        'ingredient',
+        'amount',
+    )
+
+    search_fields = ('user__username', 'ingredient__name')
+    readonly_fields = ('user', 'ingredient', 'amount')
+
+
 admin.site.empty_value_display = 'Не задано'
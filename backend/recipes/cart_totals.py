@@ -0,0 +1,111 @@
+"""Поддержка таблицы суммарных количеств Ингридиентов в корзинах."""
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from recipes.models import (
+    RecipeIngredient,
+    ShoppingCartIngredient,
+    ShoppingCartRecipe
+)
+
+UPSERT_SQL = (
+    'INSERT INTO {totals} (user_id, ingredient_id, amount) '
+    '{select} '
+    'ON CONFLICT (user_id, ingredient_id) '
+    'DO UPDATE SET amount = {totals}.amount + excluded.amount'
+)
+USER_SELECT_SQL = (
+    'SELECT %s, ingredient_id, amount * %s FROM {recipe_ingredients} '
+    'WHERE recipe_id = %s'
+)
+CARTS_SELECT_SQL = (
+    'SELECT cart.user_id, ri.ingredient_id, ri.amount * %s '
+    'FROM {recipe_ingredients} ri '
+    'JOIN {carts} cart ON cart.recipe_id = ri.recipe_id '
+    'WHERE ri.recipe_id = %s'
+)
+
+
+def _upsert(select, params):
+    tables = {
+        'totals': ShoppingCartIngredient._meta.db_table,
+        'recipe_ingredients': RecipeIngredient._meta.db_table,
+        'carts': ShoppingCartRecipe._meta.db_table,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT_SQL.format(select=select.format(**tables), **tables),
+            params
+        )
+
+
+def add_recipe_to_cart(user_id, recipe_id):
+    """Учёт Ингридиентов рецепта, добавленного в корзину."""
+    _upsert(USER_SELECT_SQL, (user_id, 1, recipe_id))
+
+
+def remove_recipe_from_cart(user_id, recipe_id):
+    """Учёт Ингридиентов рецепта, удалённого из корзины."""
+    _upsert(USER_SELECT_SQL, (user_id, -1, recipe_id))
+    ShoppingCartIngredient.objects.filter(
+        user_id=user_id, amount__lte=0
+    ).delete()
+
+
+def withdraw_recipe_from_carts(recipe):
+    """Вычитание Ингридиентов рецепта из всех корзин перед его изменением."""
+    _upsert(CARTS_SELECT_SQL, (-1, recipe.id))
+
+
+def restore_recipe_in_carts(recipe):
+    """Возврат Ингридиентов изменённого рецепта во все корзины."""
+    _upsert(CARTS_SELECT_SQL, (1, recipe.id))
+    ShoppingCartIngredient.objects.filter(
+        user__cart_recipes__recipe=recipe, amount__lte=0
+    ).delete()
+
+
+def expected_cart_totals():
+    """Суммарные количества, посчитанные по корзинам и составу рецептов."""
+    return RecipeIngredient.objects.filter(
+        recipe__cart_recipes__isnull=False
+    ).values_list(
+        'recipe__cart_recipes__user_id', 'ingredient_id'
+    ).annotate(
+        total=Sum('amount')
+    ).order_by()
+
+
+def find_cart_totals_mismatches():
+    """Расхождения таблицы с исходными данными: ключ -> (ожидание, факт)."""
+    expected = {
+        (user_id, ingredient_id): total
+        for user_id, ingredient_id, total in expected_cart_totals()
+    }
+    actual = {
+        (user_id, ingredient_id): amount
+        for user_id, ingredient_id, amount
+        in ShoppingCartIngredient.objects.values_list(
+            'user_id', 'ingredient_id', 'amount'
+        )
+    }
+    return {
+        key: (expected.get(key), actual.get(key))
+        for key in expected.keys() | actual.keys()
+        if expected.get(key) != actual.get(key)
+    }
+
+
+@transaction.atomic
+def rebuild_cart_totals(batch_size):
+    """Полное перестроение таблицы по исходным данным."""
+    ShoppingCartIngredient.objects.all().delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total
+            )
+            for user_id, ingredient_id, total in expected_cart_totals()
+        ),
+        batch_size=batch_size
+    )
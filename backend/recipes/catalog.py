@@ -0,0 +1,345 @@
+"""Версии справочников и индексы для поиска по ним в памяти процесса."""
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from operator import truediv
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core.constants import (
+    INGREDIENT_MATCH_LIMIT,
+    MAX_INGREDIENT_SEARCH_RESULTS,
+    RECIPE_INGREDIENT_DELTA_TIMEOUT,
+    RECIPE_INGREDIENT_INDEX_CHUNK_SIZE,
+    RECIPE_INGREDIENT_MAX_DELTAS,
+    USER_STATE_CACHE_TIMEOUT
+)
+from core.db_routing import fresh_reads, primary_reads
+from recipes.models import Ingredient, RecipeIngredient, Tag
+
+CATALOG_VERSION_KEY = 'catalog-version:{}'
+SCOPED_VERSION_KEY = 'catalog-version:{}:{}'
+RECIPE_INGREDIENT_CHANGES_KEY = 'recipe-ingredient-changes'
+RECIPE_INGREDIENT_DELTA_KEY = 'recipe-ingredient-delta:{}'
+
+
+def version_key(model, scope):
+    """Ключ версии и время его жизни.
+
+    Версии данных отдельного пользователя (scope) не хранятся вечно:
+    после истечения ключ получает новую версию, что лишь сбрасывает
+    закэшированное под старой.
+    """
+    label = model._meta.label_lower
+    if scope is None:
+        return CATALOG_VERSION_KEY.format(label), None
+    return SCOPED_VERSION_KEY.format(label, scope), USER_STATE_CACHE_TIMEOUT
+
+
+def get_catalog_version(model, scope=None):
+    """Текущая версия справочника или данных пользователя scope.
+
+    Версия хранится в общем кэше, поэтому изменение справочника
+    в одном процессе видно всем остальным.
+    """
+    key, timeout = version_key(model, scope)
+    version = cache.get(key)
+    if version is None:
+        version = time.time()
+        if not cache.add(key, version, timeout=timeout):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_catalog_version(model, scope=None):
+    """Смена версии справочника после изменения его данных."""
+    key, timeout = version_key(model, scope)
+    cache.set(key, time.time(), timeout=timeout)
+
+
+def bump_catalog_version_on_commit(model, scope=None):
+    """Смена версии справочника после фиксации транзакции.
+
+    До фиксации другой процесс прочитал бы старые данные
+    и закэшировал их под новой версией.
+    """
+    transaction.on_commit(lambda: bump_catalog_version(model, scope))
+
+
+def get_recipe_ingredient_changes():
+    """Номер последнего изменения состава Рецептов."""
+    changes = cache.get(RECIPE_INGREDIENT_CHANGES_KEY)
+    if changes is None:
+        cache.add(RECIPE_INGREDIENT_CHANGES_KEY, 0, timeout=None)
+        changes = cache.get(RECIPE_INGREDIENT_CHANGES_KEY, 0)
+    return changes
+
+
+def bump_recipe_ingredients_version(recipe_ids):
+    """Учёт изменения состава Рецептов после фиксации транзакции.
+
+    Каждое изменение получает номер, под которым в кэше хранятся
+    id изменённых Рецептов: процессы обновляют по ним только их
+    строки индекса. До фиксации другой процесс перечитал бы строки
+    без изменений.
+    """
+    recipe_ids = list(recipe_ids)
+
+    def bump():
+        try:
+            number = cache.incr(RECIPE_INGREDIENT_CHANGES_KEY)
+        except ValueError:
+            # Счётчик вытеснен из кэша: индекс загружается заново.
+            bump_catalog_version(RecipeIngredient)
+            return
+        cache.set(
+            RECIPE_INGREDIENT_DELTA_KEY.format(number),
+            recipe_ids,
+            RECIPE_INGREDIENT_DELTA_TIMEOUT
+        )
+
+    transaction.on_commit(bump)
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий Ингридиентов.
+
+    Загружается из БД при первом обращении и перезагружается,
+    когда меняется версия справочника Ингридиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = (None, [], [])
+
+    def invalidate(self):
+        self._data = (None, [], [])
+
+    def _load(self):
+        version = get_catalog_version(Ingredient)
+        data = self._data
+        if data[0] == version:
+            return data
+        with self._lock:
+            if self._data[0] != version:
+                with fresh_reads(version):
+                    rows = sorted(
+                        Ingredient.objects.values(
+                            'id', 'name', 'measurement_unit'
+                        ),
+                        key=lambda row: (row['name'].casefold(), row['id'])
+                    )
+                self._data = (
+                    version,
+                    [row['name'].casefold() for row in rows],
+                    rows
+                )
+            return self._data
+
+    def search(self, prefix, limit=MAX_INGREDIENT_SEARCH_RESULTS):
+        """Ингридиенты, название которых начинается с prefix.
+
+        Точные совпадения идут первыми, так как при сортировке
+        префикс оказывается раньше всех строк, которые с него начинаются.
+        """
+        _, keys, rows = self._load()
+        prefix = prefix.casefold()
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + chr(0x10FFFF), lo=start)
+        return rows[start:min(end, start + limit)]
+
+
+ingredient_index = IngredientIndex()
+
+
+class TagMap:
+    """Соответствие слагов Тегов их id.
+
+    Перезагружается, когда меняется версия справочника Тегов.
+    """
+
+    def __init__(self):
+        self._data = (None, {})
+
+    def _load(self):
+        version = get_catalog_version(Tag)
+        if self._data[0] != version:
+            with fresh_reads(version):
+                self._data = (
+                    version, dict(Tag.objects.values_list('slug', 'id'))
+                )
+        return self._data[1]
+
+    def choices(self):
+        return [(slug, slug) for slug in self._load()]
+
+    def ids(self, slugs):
+        mapping = self._load()
+        return [mapping[slug] for slug in slugs if slug in mapping]
+
+
+tag_map = TagMap()
+
+
+class RecipeIngredientIndex:
+    """Инвертированный индекс: id Ингридиента -> id Рецептов с ним.
+
+    Списки Рецептов хранятся отсортированными массивами, а для каждого
+    Рецепта - число его Ингридиентов. Целиком индекс загружается
+    при первом обращении и смене версии состава Рецептов (массовая
+    загрузка, удаление Ингридиентов). После изменения Рецептов
+    перечитываются только их строки: обновлённые массивы создаются
+    заново, поэтому match читает индекс без блокировки.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = (None, None, {}, array('H'))
+
+    def _load(self):
+        version = get_catalog_version(RecipeIngredient)
+        changes = get_recipe_ingredient_changes()
+        data = self._data
+        if data[:2] == (version, changes):
+            return data
+        with self._lock:
+            data = self._data
+            if data[:2] == (version, changes):
+                return data
+            recipe_ids = None
+            if (
+                data[0] == version
+                and 0 < changes - data[1] <= RECIPE_INGREDIENT_MAX_DELTAS
+            ):
+                keys = [
+                    RECIPE_INGREDIENT_DELTA_KEY.format(number)
+                    for number in range(data[1] + 1, changes + 1)
+                ]
+                deltas = cache.get_many(keys)
+                if len(deltas) == len(keys):
+                    recipe_ids = set().union(*deltas.values())
+            if recipe_ids is None:
+                self._data = (version, changes, *self._load_all(version))
+            else:
+                self._data = (
+                    version,
+                    changes,
+                    *self._apply(data[2], data[3], recipe_ids)
+                )
+            return self._data
+
+    def _load_all(self, version):
+        postings = {}
+        sizes = array('H')
+        with fresh_reads(version):
+            rows = RecipeIngredient.objects.order_by(
+                'ingredient_id', 'recipe_id'
+            ).values_list('ingredient_id', 'recipe_id').iterator(
+                chunk_size=RECIPE_INGREDIENT_INDEX_CHUNK_SIZE
+            )
+            for ingredient_id, recipe_id in rows:
+                if ingredient_id not in postings:
+                    postings[ingredient_id] = array('L')
+                postings[ingredient_id].append(recipe_id)
+                if recipe_id >= len(sizes):
+                    sizes.frombytes(bytes(
+                        sizes.itemsize * (recipe_id + 1 - len(sizes))
+                    ))
+                sizes[recipe_id] += 1
+        return postings, sizes
+
+    def _apply(self, postings, sizes, recipe_ids):
+        """Копия индекса с перечитанными строками Рецептов recipe_ids."""
+        wanted = defaultdict(set)
+        with primary_reads():
+            for ingredient_id, recipe_id in RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values_list('ingredient_id', 'recipe_id'):
+                wanted[ingredient_id].add(recipe_id)
+        postings = dict(postings)
+        sizes = array('H', sizes)
+        for recipe_id in recipe_ids:
+            if recipe_id < len(sizes):
+                sizes[recipe_id] = 0
+        for ingredient_id in set(postings).union(wanted):
+            recipe_list = postings.get(ingredient_id, array('L'))
+            present = set()
+            for recipe_id in recipe_ids:
+                position = bisect_left(recipe_list, recipe_id)
+                if (
+                    position < len(recipe_list)
+                    and recipe_list[position] == recipe_id
+                ):
+                    present.add(recipe_id)
+            added = wanted[ingredient_id]
+            for recipe_id in added:
+                if recipe_id >= len(sizes):
+                    sizes.frombytes(bytes(
+                        sizes.itemsize * (recipe_id + 1 - len(sizes))
+                    ))
+                sizes[recipe_id] += 1
+            if present == added:
+                continue
+            recipe_list = array('L', recipe_list)
+            for recipe_id in present - added:
+                del recipe_list[bisect_left(recipe_list, recipe_id)]
+            for recipe_id in added - present:
+                recipe_list.insert(
+                    bisect_left(recipe_list, recipe_id), recipe_id
+                )
+            if recipe_list:
+                postings[ingredient_id] = recipe_list
+            else:
+                del postings[ingredient_id]
+        return postings, sizes
+
+    def match(
+        self, include, exclude=(), match_all=True,
+        limit=INGREDIENT_MATCH_LIMIT
+    ):
+        """Рецепты с Ингридиентами include и без Ингридиентов exclude.
+
+        При match_all Рецепт должен содержать все Ингридиенты include,
+        иначе хотя бы один. Возвращает до limit пар (id Рецепта, доля
+        его Ингридиентов из include) по убыванию доли, затем id.
+        """
+        _, _, postings, sizes = self._load()
+        empty = array('L')
+        lists = sorted(
+            (postings.get(ingredient_id, empty) for ingredient_id in include),
+            key=len
+        )
+        if match_all:
+            candidates = set(lists[0])
+            for recipe_ids in lists[1:]:
+                candidates.intersection_update(recipe_ids)
+            for ingredient_id in exclude:
+                candidates.difference_update(postings.get(ingredient_id, ()))
+            matched = dict.fromkeys(candidates, len(lists))
+        else:
+            matched = Counter()
+            for recipe_ids in lists:
+                matched.update(recipe_ids)
+            for ingredient_id in exclude:
+                for recipe_id in set(
+                    postings.get(ingredient_id, ())
+                ).intersection(matched):
+                    del matched[recipe_id]
+        # Доли считаются через map и zip без цикла на Python:
+        # на частых Ингридиентах кандидатов сотни тысяч.
+        coverages = map(
+            truediv, matched.values(), map(sizes.__getitem__, matched)
+        )
+        return [
+            (recipe_id, coverage)
+            for coverage, recipe_id in heapq.nlargest(
+                limit, zip(coverages, matched)
+            )
+        ]
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
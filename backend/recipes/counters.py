@@ -0,0 +1,83 @@
+"""Денормализованные счётчики Рецептов и Пользователей.
+
+Счётчики меняются через F() в транзакции изменения исходных строк,
+а reconcile_counters пересчитывает их после загрузки данных в обход
+моделей или при расхождениях.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCartRecipe
+from users.models import Subscribe, User
+
+# Счётчики модели: поле -> исходная модель и её связь с моделью счётчика.
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (FavoriteRecipe, 'recipe'),
+        'in_carts_count': (ShoppingCartRecipe, 'recipe'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Subscribe, 'author'),
+    },
+}
+
+
+def change_counter(model, pk, field, delta):
+    """Изменение счётчика без чтения его значения.
+
+    Счётчик не опускается ниже нуля, даже если успел разойтись
+    с данными; такие расхождения исправляет reconcile_counters.
+    """
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+
+
+def actual_count(source, relation):
+    return Coalesce(
+        Subquery(
+            source.objects.filter(
+                **{relation: OuterRef('pk')}
+            ).order_by().values(relation).annotate(
+                total=Count('pk')
+            ).values('total')
+        ),
+        0
+    )
+
+
+def find_counter_mismatches():
+    """Расхождения счётчиков: (модель, pk, поле, в таблице, ожидается)."""
+    mismatches = []
+    for model, counters in COUNTERS.items():
+        for field, (source, relation) in counters.items():
+            rows = model.objects.annotate(
+                actual=actual_count(source, relation)
+            ).exclude(**{field: F('actual')}).order_by('pk').values_list(
+                'pk', field, 'actual'
+            )
+            mismatches.extend(
+                (model, pk, field, stored, actual)
+                for pk, stored, actual in rows
+            )
+    return mismatches
+
+
+def reconcile_counters(batch_size):
+    """Пересчёт всех счётчиков пачками по pk."""
+    for model, counters in COUNTERS.items():
+        last_pk = 0
+        while True:
+            batch = list(
+                model.objects.filter(pk__gt=last_pk).order_by(
+                    'pk'
+                ).values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            model.objects.filter(pk__in=batch).update(**{
+                field: actual_count(source, relation)
+                for field, (source, relation) in counters.items()
+            })
+            last_pk = batch[-1]
@@ -0,0 +1,144 @@
+"""Лента подписок: записи о новых Рецептах авторов для их подписчиков.
+
+Рецепты обычных авторов добавляются в ленты подписчиков при публикации.
+Авторы с числом подписчиков от FEED_FANOUT_LIMIT помечаются feed_pulled:
+их Рецепты добавляются в ленту подписчика при её чтении. В обоих случаях
+лента читается по индексу таблицы записей.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from core.constants import (
+    FEED_BACKFILL_SIZE,
+    FEED_FANOUT_LIMIT,
+    FEED_PULL_CACHE_TIMEOUT,
+    FEED_PULL_OVERLAP
+)
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscribe, User
+
+FEED_PULLED_KEY = 'feed-pulled:{}'
+FANOUT_SQL = (
+    'INSERT INTO {feed} (user_id, author_id, recipe_id, created_at) '
+    'SELECT subscription.user_id, recipe.author_id, recipe.id, '
+    'recipe.created_at FROM {subscriptions} subscription '
+    'JOIN {recipes} recipe ON recipe.author_id = subscription.author_id '
+    'WHERE recipe.id = %s '
+    'ON CONFLICT DO NOTHING'
+)
+REBUILD_SQL = (
+    'INSERT INTO {feed} (user_id, author_id, recipe_id, created_at) '
+    'SELECT subscription.user_id, recipe.author_id, recipe.id, '
+    'recipe.created_at FROM {subscriptions} subscription '
+    'JOIN (SELECT id, author_id, created_at, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY created_at DESC, id DESC'
+    ') AS recent_rank FROM {recipes}) recipe '
+    'ON recipe.author_id = subscription.author_id '
+    'WHERE recipe.recent_rank <= %s '
+    'ON CONFLICT DO NOTHING'
+)
+
+
+def _execute(sql, params):
+    tables = {
+        'feed': FeedEntry._meta.db_table,
+        'subscriptions': Subscribe._meta.db_table,
+        'recipes': Recipe._meta.db_table,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(**tables), params)
+
+
+def _entries(user_id, recipes):
+    return FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                author_id=author_id,
+                recipe_id=recipe_id,
+                created_at=created_at
+            )
+            for recipe_id, author_id, created_at in recipes.values_list(
+                'id', 'author_id', 'created_at'
+            )
+        ),
+        ignore_conflicts=True
+    )
+
+
+def fan_out_recipe(recipe):
+    """Добавление нового Рецепта в ленты подписчиков автора.
+
+    При FEED_FANOUT_LIMIT подписчиков автор переводится
+    на чтение ленты по запросу.
+    """
+    author = User.objects.filter(pk=recipe.author_id)
+    feed_pulled, followers = author.values_list(
+        'feed_pulled', 'followers_count'
+    ).get()
+    if feed_pulled:
+        return
+    if followers >= FEED_FANOUT_LIMIT:
+        author.update(feed_pulled=True)
+        return
+    _execute(FANOUT_SQL, (recipe.pk,))
+
+
+def subscribe_feed(user_id, author_id):
+    """Последние Рецепты автора в ленте нового подписчика."""
+    _entries(
+        user_id,
+        Recipe.objects.filter(author_id=author_id).order_by(
+            '-created_at', '-id'
+        )[:FEED_BACKFILL_SIZE]
+    )
+
+
+def unsubscribe_feed(user_id, author_id):
+    """Удаление Рецептов автора из ленты бывшего подписчика."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pull_feed(user):
+    """Добавление в ленту новых Рецептов авторов с чтением по запросу.
+
+    Рецепты забираются с момента прошлого чтения с запасом
+    FEED_PULL_OVERLAP секунд на транзакции, зафиксированные позже.
+    """
+    authors = list(
+        Subscribe.objects.filter(
+            user=user, author__feed_pulled=True
+        ).order_by().values_list('author_id', flat=True)
+    )
+    if not authors:
+        return
+    key = FEED_PULLED_KEY.format(user.pk)
+    pulled_at = cache.get(key)
+    now = timezone.now()
+    if pulled_at is None:
+        recipes = Recipe.objects.latest_per_author(
+            authors, FEED_BACKFILL_SIZE
+        )
+    else:
+        recipes = Recipe.objects.filter(
+            author__in=authors,
+            created_at__gte=pulled_at - timedelta(seconds=FEED_PULL_OVERLAP)
+        )
+    _entries(user.pk, recipes)
+    cache.set(key, now, FEED_PULL_CACHE_TIMEOUT)
+
+
+def rebuild_feed():
+    """Заполнение лент по текущим подпискам.
+
+    Нужно после загрузки подписок и Рецептов в обход моделей
+    и пересчёта счётчиков: каждая подписка получает последние
+    FEED_BACKFILL_SIZE Рецептов автора.
+    """
+    User.objects.filter(
+        followers_count__gte=FEED_FANOUT_LIMIT
+    ).update(feed_pulled=True)
+    _execute(REBUILD_SQL, (FEED_BACKFILL_SIZE,))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.trending import compact_activity, refresh_trending
+
+
+class Command(BaseCommand):
+    """Сжатие активности по Рецептам и пересчёт трендов."""
+
+    help = (
+        'Объединяет старые почасовые строки активности в дневные, удаляет '
+        'строки вне окон трендов и пересчитывает топ трендовых Рецептов. '
+        'Запускается периодически, например раз в несколько минут из cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--skip-compaction',
+            action='store_true',
+            help='Только пересчитать топ без сжатия активности.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_compaction']:
+            compact_activity()
+        refresh_trending()
+        self.stdout.write(self.style.SUCCESS('Тренды пересчитаны.'))
@@ -1,37 +1,104 @@
 import json
 
 from django.core.management.base import BaseCommand, CommandError
-from tqdm import tqdm
+from django.db import DatabaseError, connection, transaction
 
-from foodgram.settings import PATH_TO_INGREDIENTS, PATH_TO_TAGS
+from foodgram.settings import (
+    PATH_TO_INGREDIENTS,
+    PATH_TO_INGREDIENTS_CSV,
+    PATH_TO_TAGS
+)
+from recipes.catalog import bump_catalog_version
 from recipes.models import Ingredient, Tag
 
+COPY_TABLE = 'ingredients_import'
+
 
 class Command(BaseCommand):
-    """Загрузка ингридиентов в БД."""
+    """Загрузка ингридиентов и тегов в БД.
 
-    def handle(self, *args, **options):
+    Повторный запуск не создаёт дубликатов: уже существующие
+    записи пропускаются.
+    """
 
-        with open(PATH_TO_INGREDIENTS, 'r', encoding='UTF-8') as file:
-            ingredients = json.load(file)
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Размер пачки при вставке.'
+        )
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY на PostgreSQL.'
+        )
 
-            for ingredient in tqdm(ingredients):
-                try:
-                    Ingredient.objects.get_or_create(**ingredient)
-                except CommandError as error:
-                    raise CommandError(
-                        f'Ошибка при добавление ингридиента: {ingredient}.'
-                        f' Описание: {error}'
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть положительным.')
+        try:
+            with transaction.atomic():
+                if (
+                    connection.vendor == 'postgresql'
+                    and not options['no_copy']
+                ):
+                    inserted, total = self.copy_ingredients()
+                else:
+                    inserted, total = self.bulk_load(
+                        Ingredient,
+                        PATH_TO_INGREDIENTS,
+                        ('name', 'measurement_unit'),
+                        options['chunk_size']
                     )
+                self.report('Ингридиенты', Ingredient, inserted, total)
+                inserted, total = self.bulk_load(
+                    Tag, PATH_TO_TAGS, ('slug',), options['chunk_size']
+                )
+                self.report('Теги', Tag, inserted, total)
+        except (OSError, ValueError, DatabaseError) as error:
+            raise CommandError(f'Ошибка при загрузке данных: {error}')
 
-        with open(PATH_TO_TAGS, 'r', encoding='UTF-8') as file:
-            tags = json.load(file)
+    def bulk_load(self, model, path, key_fields, chunk_size):
+        """Вставка пачками записей, которых ещё нет в БД."""
+        with open(path, 'r', encoding='UTF-8') as file:
+            rows = json.load(file)
+        existing = set(model.objects.values_list(*key_fields))
+        before = model.objects.count()
+        model.objects.bulk_create(
+            (
+                model(**row)
+                for row in rows
+                if tuple(row[field] for field in key_fields) not in existing
+            ),
+            batch_size=chunk_size,
+            ignore_conflicts=True
+        )
+        return model.objects.count() - before, len(rows)
 
-            for tag in tqdm(tags):
-                try:
-                    Tag.objects.get_or_create(**tag)
-                except CommandError as error:
-                    raise CommandError(
-                        f'Ошибка при добавление тега: {tag}.'
-                        f' Описание: {error}'
-                    )
+    def copy_ingredients(self):
+        """Загрузка Ингридиентов из CSV через COPY во временную таблицу."""
+        table = Ingredient._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE {COPY_TABLE} '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            with open(PATH_TO_INGREDIENTS_CSV, 'r', encoding='UTF-8') as file:
+                cursor.copy_expert(
+                    f'COPY {COPY_TABLE} (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)',
+                    file
+                )
+            cursor.execute(f'SELECT COUNT(*) FROM {COPY_TABLE}')
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit FROM {COPY_TABLE} '
+                'ON CONFLICT ON CONSTRAINT unique_ingredient DO NOTHING'
+            )
+            return cursor.rowcount, total
+
+    def report(self, title, model, inserted, total):
+        if inserted:
+            bump_catalog_version(model)
+        self.stdout.write(
+            f'{title}: добавлено {inserted}, пропущено {total - inserted}.'
+        )
@@ -0,0 +1,301 @@
+import random
+from itertools import accumulate
+from multiprocessing import Pool
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+
+from recipes.cart_totals import rebuild_cart_totals
+from recipes.catalog import bump_catalog_version
+from recipes.counters import reconcile_counters
+from recipes.feed import rebuild_feed
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    RecipeTag,
+    ShoppingCartRecipe,
+    Tag
+)
+from recipes.search import rebuild_search_vectors
+from users.models import Subscribe, User
+
+USERNAME_PREFIX = 'generated_user_'
+RECIPE_IMAGE = 'recipes/images/temp.png'
+# Параметр формы распределения Парето для размеров подписок,
+# избранного и корзин: среднее равно PARETO_SHAPE / (PARETO_SHAPE - 1).
+PARETO_SHAPE = 1.5
+
+# Данные, общие для всех пачек; в дочерних процессах
+# заполняются функцией init_worker.
+shared = {}
+
+
+def init_worker(data):
+    shared.update(data)
+    connections.close_all()
+
+
+def power_law_weights(size, alpha):
+    """Накопленные веса закона Ципфа для size элементов."""
+    return list(accumulate(1 / (rank ** alpha) for rank in range(1, size + 1)))
+
+
+def heavy_tail_count(rng, mean, limit):
+    """Размер с тяжёлым хвостом и заданным средним."""
+    scale = mean * (PARETO_SHAPE - 1) / PARETO_SHAPE
+    return min(int(scale * rng.paretovariate(PARETO_SHAPE)), limit)
+
+
+def chunk_rng(kind, index):
+    return random.Random(f'{shared["seed"]}-{kind}-{index}')
+
+
+@transaction.atomic
+def generate_recipes(chunk):
+    """Пачка рецептов со связями с тегами и ингридиентами."""
+    index, start, size = chunk
+    rng = chunk_rng('recipes', index)
+    authors = shared['authors']
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            name=f'Рецепт {number}',
+            text=f'Описание рецепта {number}',
+            image=RECIPE_IMAGE,
+            cooking_time=rng.randint(1, 180),
+            author_id=author,
+        )
+        for number, author in zip(
+            range(start, start + size),
+            rng.choices(
+                authors, cum_weights=shared['author_weights'], k=size
+            )
+        )
+    )
+    if recipes[0].pk is None:
+        ids = dict(
+            Recipe.objects.filter(
+                id__gt=shared['last_recipe_id'],
+                name__in=[recipe.name for recipe in recipes]
+            ).values_list('name', 'id')
+        )
+        recipe_ids = [ids[recipe.name] for recipe in recipes]
+    else:
+        recipe_ids = [recipe.pk for recipe in recipes]
+    tags = shared['tags']
+    ingredients = shared['ingredients']
+    RecipeTag.objects.bulk_create(
+        RecipeTag(recipe_id=recipe, tag_id=tag)
+        for recipe in recipe_ids
+        for tag in rng.sample(tags, rng.randint(1, len(tags)))
+    )
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(
+            recipe_id=recipe,
+            ingredient_id=ingredient,
+            amount=rng.randint(1, 500)
+        )
+        for recipe in recipe_ids
+        for ingredient in rng.sample(
+            ingredients, min(rng.randint(3, 12), len(ingredients))
+        )
+    )
+    return recipe_ids
+
+
+@transaction.atomic
+def generate_user_relations(chunk):
+    """Подписки, избранное и корзины для пачки пользователей."""
+    index, users = chunk
+    rng = chunk_rng('relations', index)
+    authors = shared['authors']
+    recipes = shared['recipes']
+    subscriptions = []
+    favorites = []
+    carts = []
+    for user in users:
+        subscriptions.extend(
+            Subscribe(user_id=user, author_id=author)
+            for author in set(rng.choices(
+                authors,
+                cum_weights=shared['author_weights'],
+                k=heavy_tail_count(
+                    rng, shared['subscriptions'], len(authors)
+                )
+            ))
+            if author != user
+        )
+        for model, mean, objects in (
+            (FavoriteRecipe, shared['favorites'], favorites),
+            (ShoppingCartRecipe, shared['cart'], carts),
+        ):
+            objects.extend(
+                model(user_id=user, recipe_id=recipe)
+                for recipe in set(rng.choices(
+                    recipes,
+                    cum_weights=shared['recipe_weights'],
+                    k=heavy_tail_count(rng, mean, len(recipes))
+                ))
+            )
+    for model, objects in (
+        (Subscribe, subscriptions),
+        (FavoriteRecipe, favorites),
+        (ShoppingCartRecipe, carts),
+    ):
+        model.objects.bulk_create(
+            objects, batch_size=shared['batch_size'], ignore_conflicts=True
+        )
+    return len(subscriptions), len(favorites), len(carts)
+
+
+class Command(BaseCommand):
+    """Генерация больших объёмов данных для нагрузочного тестирования."""
+
+    help = (
+        'Генерирует пользователей, рецепты, подписки, избранное и корзины '
+        'со степенными распределениями авторов и популярности рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--recipes', type=int, default=100_000)
+        parser.add_argument(
+            '--subscriptions', type=float, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--favorites', type=float, default=30,
+            help='Среднее число избранных рецептов пользователя.'
+        )
+        parser.add_argument(
+            '--cart', type=float, default=5,
+            help='Среднее число рецептов в корзине пользователя.'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель степени распределения Ципфа.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5_000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Количество процессов.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError(
+                '--batch-size и --workers должны быть положительными.'
+            )
+        if options['users'] < 1:
+            raise CommandError('--users должен быть положительным.')
+        if not Ingredient.objects.exists() or not Tag.objects.exists():
+            call_command('fill_db')
+        rng = random.Random(options['seed'])
+        authors = self.create_users(options['users'], options['batch_size'])
+        rng.shuffle(authors)
+        data = {
+            'seed': options['seed'],
+            'batch_size': options['batch_size'],
+            'subscriptions': options['subscriptions'],
+            'favorites': options['favorites'],
+            'cart': options['cart'],
+            'authors': authors,
+            'author_weights': power_law_weights(
+                len(authors), options['alpha']
+            ),
+            'tags': list(Tag.objects.values_list('id', flat=True)),
+            'ingredients': list(
+                Ingredient.objects.values_list('id', flat=True)
+            ),
+            'last_recipe_id': (
+                Recipe.objects.order_by('-id').values_list(
+                    'id', flat=True
+                ).first() or 0
+            ),
+        }
+        first_number = Recipe.objects.count()
+        recipe_chunks = [
+            (index, first_number + start, min(
+                options['batch_size'], options['recipes'] - start
+            ))
+            for index, start in enumerate(
+                range(0, options['recipes'], options['batch_size'])
+            )
+        ]
+        recipes = [
+            recipe
+            for chunk in self.run(
+                generate_recipes, recipe_chunks, data, options['workers']
+            )
+            for recipe in chunk
+        ]
+        self.stdout.write(f'Рецептов: {len(recipes)}.')
+        if not recipes:
+            return
+        rng.shuffle(recipes)
+        data['recipes'] = recipes
+        data['recipe_weights'] = power_law_weights(
+            len(recipes), options['alpha']
+        )
+        users_per_chunk = max(
+            1, options['batch_size'] // max(1, int(options['favorites']))
+        )
+        user_chunks = list(enumerate(
+            authors[start:start + users_per_chunk]
+            for start in range(0, len(authors), users_per_chunk)
+        ))
+        totals = [0, 0, 0]
+        for counts in self.run(
+            generate_user_relations, user_chunks, data, options['workers']
+        ):
+            totals = [total + count for total, count in zip(totals, counts)]
+        self.stdout.write(
+            f'Подписок: {totals[0]}, избранного: {totals[1]}, '
+            f'в корзинах: {totals[2]}.'
+        )
+        rebuild_cart_totals(options['batch_size'])
+        rebuild_search_vectors(options['batch_size'])
+        bump_catalog_version(RecipeIngredient)
+        reconcile_counters(options['batch_size'])
+        rebuild_feed()
+        self.stdout.write(self.style.SUCCESS('Генерация завершена.'))
+
+    def create_users(self, count, batch_size):
+        """Создание пользователей; возвращает id всех сгенерированных."""
+        start = User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).count()
+        password = make_password(None)
+        User.objects.bulk_create(
+            (
+                User(
+                    username=f'{USERNAME_PREFIX}{number}',
+                    email=f'{USERNAME_PREFIX}{number}@foodgram.local',
+                    first_name='Пользователь',
+                    last_name=str(number),
+                    password=password,
+                )
+                for number in range(start, start + count)
+            ),
+            batch_size=batch_size,
+            ignore_conflicts=True
+        )
+        self.stdout.write(f'Пользователей: {count}.')
+        return list(
+            User.objects.filter(
+                username__startswith=USERNAME_PREFIX
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+    def run(self, func, chunks, data, workers):
+        """Обработка пачек в текущем процессе или в пуле процессов."""
+        if workers == 1:
+            shared.update(data)
+            return map(func, chunks)
+        connections.close_all()
+        with Pool(workers, initializer=init_worker, initargs=(data,)) as pool:
+            return pool.map(func, chunks)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from core.constants import AVATAR_IMAGE_SIZES, RECIPE_IMAGE_SIZES
+from core.images import build_image_variants, is_processed
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    """Построение вариантов изображений, которых ещё нет."""
+
+    help = (
+        'Строит уменьшенные варианты и WebP для изображений рецептов '
+        'и аватаров, загруженных до появления вариантов.'
+    )
+
+    def handle(self, *args, **options):
+        for model, field_name, sizes in (
+            (Recipe, 'image', RECIPE_IMAGE_SIZES),
+            (User, 'avatar', AVATAR_IMAGE_SIZES),
+        ):
+            processed = failed = 0
+            queryset = model.objects.exclude(
+                **{field_name: ''}
+            ).exclude(
+                **{f'{field_name}__isnull': True}
+            ).only('pk', field_name, f'{field_name}_variants')
+            for instance in queryset.iterator():
+                if is_processed(instance, field_name):
+                    continue
+                try:
+                    build_image_variants(
+                        model, instance.pk, field_name, sizes
+                    )
+                    processed += 1
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f'{instance.pk}: {error}')
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: обработано {processed}, '
+                f'с ошибкой {failed}.'
+            )
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.cart_totals import (
+    find_cart_totals_mismatches,
+    rebuild_cart_totals
+)
+
+
+class Command(BaseCommand):
+    """Сверка и перестроение суммарных количеств в корзинах."""
+
+    help = (
+        'Перестраивает таблицу суммарных количеств Ингридиентов в корзинах '
+        'по корзинам и составу рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить таблицу, не изменяя её.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Размер пачки при вставке.'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            rebuild_cart_totals(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS('Таблица перестроена.'))
+            return
+        mismatches = find_cart_totals_mismatches()
+        for (user_id, ingredient_id), (expected, actual) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(
+                f'Пользователь {user_id}, ингридиент {ingredient_id}: '
+                f'ожидается {expected}, в таблице {actual}'
+            )
+        if mismatches:
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}.')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
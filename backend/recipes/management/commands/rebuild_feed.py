@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_feed
+
+
+class Command(BaseCommand):
+    """Заполнение лент подписок по текущим подпискам."""
+
+    help = (
+        'Добавляет в ленты подписчиков последние Рецепты авторов, например '
+        'после массовой загрузки подписок и Рецептов в обход моделей '
+        'и пересчёта счётчиков (reconcile_counters).'
+    )
+
+    def handle(self, *args, **options):
+        rebuild_feed()
+        self.stdout.write(self.style.SUCCESS('Ленты подписок заполнены.'))
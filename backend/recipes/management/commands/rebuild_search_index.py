@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.search import rebuild_search_vectors
+
+
+class Command(BaseCommand):
+    """Пересчёт поисковых векторов Рецептов."""
+
+    help = (
+        'Пересчитывает поисковые векторы всех Рецептов, например '
+        'после массовой загрузки данных в обход моделей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество Рецептов в одном UPDATE.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        rebuild_search_vectors(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Поисковые векторы обновлены.'))
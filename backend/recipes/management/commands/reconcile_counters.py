@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.counters import find_counter_mismatches, reconcile_counters
+
+
+class Command(BaseCommand):
+    """Сверка и пересчёт счётчиков Рецептов и Пользователей."""
+
+    help = (
+        'Пересчитывает счётчики избранного, корзин, рецептов и подписчиков '
+        'по исходным таблицам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сверить счётчики, не изменяя их.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одном UPDATE.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть положительным.')
+        if not options['verify']:
+            reconcile_counters(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS('Счётчики пересчитаны.'))
+            return
+        mismatches = find_counter_mismatches()
+        for model, pk, field, stored, actual in mismatches:
+            self.stdout.write(
+                f'{model._meta.verbose_name} {pk}, {field}: '
+                f'ожидается {actual}, в таблице {stored}'
+            )
+        if mismatches:
+            raise CommandError(f'Найдено расхождений: {len(mismatches)}.')
+        self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:47
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_cart_totals(apps, schema_editor):
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    totals = RecipeIngredient.objects.filter(
+        recipe__cart_recipes__isnull=False
+    ).values_list(
+        'recipe__cart_recipes__user_id', 'ingredient_id'
+    ).annotate(total=models.Sum('amount')).order_by()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=total
+            )
+            for user_id, ingredient_id, total in totals
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0003_auto_20250201_1748'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0, verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to='recipes.ingredient', verbose_name='Ингридиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингридиент в корзине',
+                'verbose_name_plural': 'Ингридиенты в корзине',
+                'ordering': ('user',),
+                'default_related_name': 'cart_ingredients',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_cart_ingredient'),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
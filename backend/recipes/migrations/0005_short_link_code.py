@@ -0,0 +1,27 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+def strip_short_link_urls(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.exclude(short_link='')
+    for recipe in recipes:
+        recipe.short_link = recipe.short_link.rstrip('/').rsplit('/', 1)[-1]
+    Recipe.objects.bulk_update(recipes, ['short_link'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(strip_short_link_urls, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='recipe',
+            name='short_link',
+            field=models.CharField(blank=True, db_index=True, max_length=256, verbose_name='Код короткой ссылки'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_short_link_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображения'),
+        ),
+    ]
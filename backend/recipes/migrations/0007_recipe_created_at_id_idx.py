@@ -0,0 +1,21 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'default_related_name': 'recipes', 'ordering': ('-created_at', '-id'), 'verbose_name': 'Рецепт', 'verbose_name_plural': 'Рецепты'},
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-created_at', '-id'], name='recipe_created_at_id_idx'),
+        ),
+    ]
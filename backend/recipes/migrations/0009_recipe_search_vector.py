@@ -0,0 +1,52 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:18
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# GIN-индекс и заполнение вектора есть только в PostgreSQL,
+# на остальных БД поиск идёт по подстрокам без хранимого вектора.
+CREATE_INDEX_SQL = (
+    'CREATE INDEX recipe_search_vector_gin_idx '
+    'ON recipes_recipe USING gin (search_vector)'
+)
+DROP_INDEX_SQL = 'DROP INDEX IF EXISTS recipe_search_vector_gin_idx'
+FILL_SQL = """
+UPDATE recipes_recipe AS recipe SET search_vector =
+    setweight(to_tsvector('russian', recipe.name), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient AS recipe_ingredient
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = recipe_ingredient.ingredient_id
+        WHERE recipe_ingredient.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', recipe.text), 'C')
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(FILL_SQL)
+    schema_editor.execute(CREATE_INDEX_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+FILL_FEED_SQL = (
+    'INSERT INTO recipes_feedentry (user_id, author_id, recipe_id, created_at) '
+    'SELECT subscription.user_id, recipe.author_id, recipe.id, '
+    'recipe.created_at FROM users_subscribe subscription '
+    'JOIN (SELECT id, author_id, created_at, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY created_at DESC, id DESC'
+    ') AS recent_rank FROM recipes_recipe) recipe '
+    'ON recipe.author_id = subscription.author_id '
+    'WHERE recipe.recent_rank <= 50'
+)
+
+
+def fill_feed(apps, schema_editor):
+    schema_editor.execute(FILL_FEED_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0009_recipe_search_vector'),
+        ('users', '0004_user_feed_pulled'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+                'ordering': ('user', '-created_at'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-created_at', '-recipe'], name='feed_user_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_feed_recipe'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
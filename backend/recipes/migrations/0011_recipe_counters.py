@@ -0,0 +1,51 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:31
+
+from django.db import migrations, models
+import django.db.models.expressions
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, relation):
+    return Coalesce(Subquery(
+        model.objects.filter(**{relation: OuterRef('pk')}).order_by().values(
+            relation
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=count_of(
+            apps.get_model('recipes', 'FavoriteRecipe'), 'recipe'
+        ),
+        in_carts_count=count_of(
+            apps.get_model('recipes', 'ShoppingCartRecipe'), 'recipe'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество добавлений в корзины'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(django.db.models.expressions.OrderBy(django.db.models.expressions.CombinedExpression(django.db.models.expressions.F('favorites_count'), '+', django.db.models.expressions.F('in_carts_count')), descending=True), django.db.models.expressions.OrderBy(django.db.models.expressions.F('id'), descending=True), name='recipe_popularity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
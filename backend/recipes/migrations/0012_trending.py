@@ -0,0 +1,57 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:36
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingRecipe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window', models.CharField(choices=[('24h', '24h'), ('7d', '7d')], max_length=8, verbose_name='Окно')),
+                ('position', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('score', models.PositiveIntegerField(verbose_name='Добавлений в избранное и корзины')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Рецепт в трендах',
+                'verbose_name_plural': 'Тренды',
+                'ordering': ('window', 'position'),
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateTimeField(verbose_name='Начало периода')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в корзины')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Активность по рецепту',
+                'verbose_name_plural': 'Активность по рецептам',
+                'ordering': ('-period',),
+                'default_related_name': 'activity',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trendingrecipe',
+            constraint=models.UniqueConstraint(fields=('window', 'position'), name='unique_trending_window_position'),
+        ),
+        migrations.AddIndex(
+            model_name='recipeactivity',
+            index=models.Index(fields=['period'], name='recipe_activity_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeactivity',
+            constraint=models.UniqueConstraint(fields=('recipe', 'period'), name='unique_recipe_activity_period'),
+        ),
+    ]
@@ -1,5 +1,9 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Exists, F, OuterRef, Prefetch, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
 from core.constants import (
     MAX_INGREDIENT_NAME_LENGTH,
@@ -8,12 +12,14 @@ from core.constants import (
     MAX_RECIPE_NAME_LENGTH,
     MAX_TAG_NAME_LENGTH,
     MAX_TAG_SLUG_LENGTH,
+    MAX_TRENDING_WINDOW_LENGTH,
     MAX_VIEW_LENGTH,
     MIN_COCKING_TIME,
     MIN_INGREDIENT_AMOUNT,
+    TRENDING_WINDOWS,
 )
 
-from users.models import User
+from users.models import Subscribe, User
 
 
 class Tag(models.Model):
@@ -66,6 +72,127 @@ class Ingredient(models.Model):
         return self.name[:MAX_VIEW_LENGTH]
 
 
+# Популярность Рецепта: добавления в избранное и в корзины.
+POPULARITY = F('favorites_count') + F('in_carts_count')
+
+
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet Рецептов."""
+
+    def with_related(self, user):
+        """Рецепты со связанными объектами для чтения.
+
+        Количество запросов не зависит от числа рецептов в выборке:
+        теги, ингридиенты и автор загружаются отдельными запросами,
+        а флаги пользователя вычисляются подзапросами.
+        """
+        queryset = self.prefetch_related(
+            Prefetch(
+                'recipe_tags',
+                queryset=RecipeTag.objects.select_related('tag').order_by(
+                    'recipe_id', 'id'
+                )
+            ),
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ).order_by('recipe_id', 'id')
+            ),
+        )
+        if not user.is_authenticated:
+            return queryset.select_related('author')
+        return queryset.with_user_flags(user).prefetch_related(
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(
+                    is_subscribed=Exists(
+                        Subscribe.objects.filter(
+                            user=user, author=OuterRef('pk')
+                        )
+                    )
+                )
+            )
+        )
+
+    def with_user_flags(self, user):
+        """Рецепты с флагами избранного и корзины пользователя."""
+        return self.annotate(
+            is_favorited=Exists(
+                FavoriteRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCartRecipe.objects.filter(
+                    user=user, recipe=OuterRef('pk')
+                )
+            ),
+        )
+
+    def with_versions(self, user):
+        """Рецепты для сборки из кэша документов.
+
+        Загружаются только версии документа Рецепта и его автора
+        и флаги пользователя, которые накладываются на документ.
+        """
+        queryset = self.only(
+            'id', 'author_id', 'created_at', 'updated_at'
+        ).annotate(author_updated_at=F('author__updated_at'))
+        if not user.is_authenticated:
+            return queryset
+        return queryset.with_user_flags(user).annotate(
+            author_is_subscribed=Exists(
+                Subscribe.objects.filter(
+                    user=user, author=OuterRef('author_id')
+                )
+            )
+        )
+
+    def by_popularity(self, descending=True):
+        """Рецепты по популярности, по индексу recipe_popularity_idx."""
+        ordering = ('-popularity', '-id') if descending else (
+            'popularity', 'id'
+        )
+        return self.annotate(popularity=POPULARITY).order_by(*ordering)
+
+    def in_feed(self, user):
+        """Рецепты ленты подписок пользователя в порядке публикации."""
+        return self.filter(feed_entries__user=user).annotate(
+            feed_created_at=F('feed_entries__created_at')
+        ).order_by('-feed_created_at', '-id')
+
+    def latest_per_author(self, authors, limit):
+        """Последние limit рецептов каждого из авторов одним запросом."""
+        if not authors:
+            return self.none()
+        ranked = self.filter(author__in=authors).annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('created_at').desc(), F('id').desc()),
+            )
+        ).order_by().values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(
+            pk__in=RawSQL(
+                f'SELECT id FROM ({sql}) AS ranked WHERE row_number <= %s',
+                (*params, limit)
+            )
+        )
+
+
+class RecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    """Менеджер Рецептов.
+
+    Поисковый вектор нужен только для фильтрации при поиске,
+    поэтому в объекты Рецептов он не загружается.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().defer('search_vector')
+
+
 class Recipe(models.Model):
     """Модель Рецепта."""
 
@@ -80,6 +207,12 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Изображение'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты изображения'
+    )
     cooking_time = models.PositiveSmallIntegerField(
         validators=[
             MinValueValidator(MIN_COCKING_TIME)
@@ -105,18 +238,51 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
 
     short_link = models.CharField(
         max_length=MAX_RECIPE_LINK_LENGTH,
         blank=True,
-        verbose_name='Короткая ссылка'
+        db_index=True,
+        verbose_name='Код короткой ссылки'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в избранное'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество добавлений в корзины'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+
+    objects = RecipeManager()
 
     class Meta:
-        ordering = ('-created_at',)
+        ordering = ('-created_at', '-id')
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='recipe_created_at_id_idx'
+            ),
+            models.Index(
+                POPULARITY.desc(),
+                F('id').desc(),
+                name='recipe_popularity_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name[:MAX_VIEW_LENGTH]
@@ -192,6 +358,60 @@ class RecipeIngredient(models.Model):
             f'для рецепта {self.recipe.name[:MAX_VIEW_LENGTH]}')
 
 
+class FeedEntry(models.Model):
+    """Модель записи ленты подписок пользователя.
+
+    Дата публикации копируется из Рецепта, чтобы лента читалась
+    по индексу без сортировки.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пользователь',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        ordering = ('user', '-created_at')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_feed_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created_at', '-recipe'],
+                name='feed_user_created_at_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'Рецепт: {self.recipe} в ленте пользователя {self.user}'
+
+
 class BaseFavoriteShoppingCart(models.Model):
     """Базовая модель для Избранного и Списка покупок."""
 
@@ -245,3 +465,127 @@ class ShoppingCartRecipe(BaseFavoriteShoppingCart):
 
     def __str__(self):
         return f'Рецепт: {self.recipe} в корзине пользователя {self.user}'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Модель суммарного количества Ингридиента в корзине пользователя.
+
+    Поддерживается в одной транзакции с изменением корзины
+    и состава рецептов, см. recipes.cart_totals.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингридиент',
+    )
+    amount = models.IntegerField(
+        default=0,
+        verbose_name='Количество'
+    )
+
+    class Meta:
+        ordering = ('user',)
+        verbose_name = 'Ингридиент в корзине'
+        verbose_name_plural = 'Ингридиенты в корзине'
+        default_related_name = 'cart_ingredients'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_cart_ingredient'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'Ингридиент {self.ingredient} в корзине пользователя {self.user}'
+        )
+
+
+class RecipeActivity(models.Model):
+    """Модель числа добавлений Рецепта в избранное и корзины за период.
+
+    Свежие периоды почасовые, более старые объединяются в дневные
+    командой compact_trending, см. recipes.trending.
+    """
+
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+    )
+    period = models.DateTimeField(
+        verbose_name='Начало периода'
+    )
+    favorites = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в избранное'
+    )
+    carts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Добавлений в корзины'
+    )
+
+    class Meta:
+        ordering = ('-period',)
+        verbose_name = 'Активность по рецепту'
+        verbose_name_plural = 'Активность по рецептам'
+        default_related_name = 'activity'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'period'],
+                name='unique_recipe_activity_period'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['period'],
+                name='recipe_activity_period_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'Активность по рецепту {self.recipe} с {self.period}'
+
+
+class TrendingRecipe(models.Model):
+    """Модель места Рецепта в рассчитанном топе за окно времени."""
+
+    window = models.CharField(
+        max_length=MAX_TRENDING_WINDOW_LENGTH,
+        choices=[(window, window) for window in TRENDING_WINDOWS],
+        verbose_name='Окно'
+    )
+    position = models.PositiveSmallIntegerField(
+        verbose_name='Место'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт',
+    )
+    score = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное и корзины'
+    )
+
+    class Meta:
+        ordering = ('window', 'position')
+        verbose_name = 'Рецепт в трендах'
+        verbose_name_plural = 'Тренды'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['window', 'position'],
+                name='unique_trending_window_position'
+            )
+        ]
+
+    def __str__(self):
+        return (
+            f'Рецепт {self.recipe} на {self.position} месте за {self.window}'
+        )
@@ -0,0 +1,126 @@
+"""Полнотекстовый поиск Рецептов по названию, описанию и Ингридиентам.
+
+В PostgreSQL поиск идёт по хранимому полю search_vector с GIN-индексом,
+на остальных БД используется простой поиск по подстрокам.
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector
+)
+from django.db import connection
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    IntegerField,
+    OuterRef,
+    Q,
+    Subquery,
+    Value,
+    When
+)
+from django.db.models.functions import Coalesce
+
+from core.constants import SEARCH_CONFIG
+from recipes.models import Recipe, RecipeIngredient
+
+
+class PostgresSearchBackend:
+    """Поиск по tsvector с ранжированием по релевантности.
+
+    Название весит больше названий Ингридиентов,
+    а те больше описания.
+    """
+
+    stored = True
+
+    def search(self, queryset, query):
+        query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', *Recipe._meta.ordering)
+
+    def update(self, recipes):
+        ingredient_names = RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+        recipes.update(search_vector=(
+            SearchVector('name', weight='A', config=SEARCH_CONFIG)
+            + SearchVector(
+                Coalesce(Subquery(ingredient_names), Value('')),
+                weight='B',
+                config=SEARCH_CONFIG
+            )
+            + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+        ))
+
+
+class SimpleSearchBackend:
+    """Поиск по подстрокам для БД без полнотекстового поиска.
+
+    Рецепт должен содержать каждое слово запроса; рецепты,
+    в названии которых есть весь запрос, идут первыми.
+    В SQLite регистр не учитывается только для латиницы.
+    """
+
+    stored = False
+
+    def search(self, queryset, query):
+        for word in query.split():
+            queryset = queryset.filter(
+                Q(name__icontains=word)
+                | Q(text__icontains=word)
+                | Exists(RecipeIngredient.objects.filter(
+                    recipe=OuterRef('pk'), ingredient__name__icontains=word
+                ))
+            )
+        return queryset.annotate(
+            search_rank=Case(
+                When(name__icontains=query, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField()
+            )
+        ).order_by('-search_rank', *Recipe._meta.ordering)
+
+    def update(self, recipes):
+        """Хранимый вектор не используется."""
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SimpleSearchBackend()
+
+
+def search_recipes(queryset, query):
+    """Рецепты, найденные по запросу, в порядке релевантности."""
+    return get_search_backend().search(queryset, query)
+
+
+def update_search_vectors(recipe_ids):
+    """Пересчёт поискового вектора Рецептов."""
+    get_search_backend().update(Recipe.objects.filter(pk__in=recipe_ids))
+
+
+def rebuild_search_vectors(batch_size):
+    """Пересчёт поискового вектора всех Рецептов пачками по id."""
+    backend = get_search_backend()
+    if not backend.stored:
+        return
+    last_id = 0
+    while True:
+        batch = list(
+            Recipe.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                'pk', flat=True
+            )[:batch_size]
+        )
+        if not batch:
+            return
+        backend.update(Recipe.objects.filter(pk__in=batch))
+        last_id = batch[-1]
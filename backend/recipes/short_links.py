@@ -0,0 +1,56 @@
+"""Коды коротких ссылок на рецепты.
+
+Код получается из id рецепта и подписи к нему, поэтому
+для его выдачи и разбора обращение к БД не требуется.
+"""
+import string
+
+from django.conf import settings
+from django.utils.crypto import salted_hmac
+
+from core.constants import SHORT_LINK_CHECKSUM_LENGTH
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+KEY_SALT = 'recipes.short_links'
+
+
+def to_base62(number, length=0):
+    code = ''
+    while number:
+        number, remainder = divmod(number, BASE)
+        code = ALPHABET[remainder] + code
+    return code.rjust(length, ALPHABET[0]) or ALPHABET[0]
+
+
+def from_base62(code):
+    number = 0
+    for char in code:
+        number = number * BASE + ALPHABET.index(char)
+    return number
+
+
+def checksum(recipe_id):
+    digest = salted_hmac(
+        KEY_SALT, str(recipe_id), secret=settings.SHORT_LINK_SECRET
+    ).digest()
+    return to_base62(
+        int.from_bytes(digest[:8], 'big') % BASE ** SHORT_LINK_CHECKSUM_LENGTH,
+        SHORT_LINK_CHECKSUM_LENGTH
+    )
+
+
+def encode_short_link(recipe_id):
+    """Код короткой ссылки рецепта."""
+    return to_base62(recipe_id) + checksum(recipe_id)
+
+
+def decode_short_link(code):
+    """id рецепта по коду или None, если подпись не совпала."""
+    body = code[:-SHORT_LINK_CHECKSUM_LENGTH]
+    if not body or any(char not in ALPHABET for char in code):
+        return None
+    recipe_id = from_base62(body)
+    if checksum(recipe_id) != code[-SHORT_LINK_CHECKSUM_LENGTH:]:
+        return None
+    return recipe_id
@@ -0,0 +1,201 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete
+)
+from django.dispatch import receiver
+
+from core.constants import RECIPE_IMAGE_SIZES
+from core.images import schedule_image_variants
+from recipes.cart_totals import add_recipe_to_cart, remove_recipe_from_cart
+from recipes.catalog import (
+    bump_catalog_version_on_commit,
+    bump_recipe_ingredients_version,
+    ingredient_index
+)
+from recipes.counters import change_counter
+from recipes.feed import fan_out_recipe
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCartRecipe,
+    Tag
+)
+from recipes.search import update_search_vectors
+from recipes.trending import record_activity
+from recipes.user_state import (
+    FAVORITES,
+    SHOPPING_CART,
+    change_user_state
+)
+from users.models import User
+
+# Счётчики Рецепта, которые меняются при добавлении в избранное и корзину.
+RECIPE_COUNTERS = {
+    FavoriteRecipe: 'favorites_count',
+    ShoppingCartRecipe: 'in_carts_count',
+}
+# Поля активности Рецепта для трендов.
+RECIPE_ACTIVITY = {
+    FavoriteRecipe: 'favorites',
+    ShoppingCartRecipe: 'carts',
+}
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    """Сброс индекса Ингридиентов при изменении справочника."""
+    bump_catalog_version_on_commit(Ingredient)
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Пересчёт поискового вектора Рецептов с переименованным Ингридиентом."""
+    if created:
+        return
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(
+            recipe_ingredients__ingredient=instance
+        ).values('pk')
+    ))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, **kwargs):
+    """Смена версии справочника Тегов."""
+    bump_catalog_version_on_commit(Tag)
+
+
+@receiver(post_save, sender=ShoppingCartRecipe)
+def cart_recipe_added(sender, instance, created, **kwargs):
+    """Учёт рецепта, добавленного в корзину."""
+    if created:
+        add_recipe_to_cart(instance.user_id, instance.recipe_id)
+
+
+@receiver(pre_delete, sender=ShoppingCartRecipe)
+def cart_recipe_removed(sender, instance, **kwargs):
+    """Учёт рецепта, удаляемого из корзины.
+
+    Обрабатывается до удаления, так как при удалении самого рецепта
+    его Ингридиенты удаляются каскадом вместе с корзинами.
+    """
+    remove_recipe_from_cart(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, **kwargs):
+    """Построение вариантов нового изображения рецепта."""
+    schedule_image_variants(instance, 'image', RECIPE_IMAGE_SIZES)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_ingredients_deleted(sender, instance, **kwargs):
+    """Учёт каскадно удалённых строк состава Рецепта."""
+    bump_recipe_ingredients_version([instance.pk])
+
+
+@receiver(post_delete, sender=Ingredient)
+def ingredient_recipes_deleted(sender, **kwargs):
+    """Смена версии состава Рецептов: индекс загружается заново.
+
+    Удалённый Ингридиент затрагивает все Рецепты с ним.
+    """
+    bump_catalog_version_on_commit(RecipeIngredient)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(sender, instance, created, **kwargs):
+    """Добавление нового Рецепта в ленты подписчиков автора."""
+    if created:
+        transaction.on_commit(lambda: fan_out_recipe(instance))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_changed(sender, instance, **kwargs):
+    """Пересчёт поискового вектора после сохранения Рецепта.
+
+    Выполняется после фиксации транзакции, когда
+    Ингридиенты Рецепта уже записаны.
+    """
+    transaction.on_commit(lambda: update_search_vectors([instance.pk]))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(sender, **kwargs):
+    """Смена версии Рецептов: сброс кэшированных count выборок."""
+    bump_catalog_version_on_commit(Recipe)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCartRecipe)
+@receiver(post_delete, sender=ShoppingCartRecipe)
+def user_recipes_changed(sender, instance, **kwargs):
+    """Смена версии избранного или корзины одного пользователя."""
+    bump_catalog_version_on_commit(sender, instance.user_id)
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_delete, sender=FavoriteRecipe)
+def favorites_changed(sender, instance, signal, **kwargs):
+    """Запись изменения в закэшированное избранное пользователя."""
+    transaction.on_commit(
+        lambda: change_user_state(FAVORITES, instance, signal is post_save)
+    )
+
+
+@receiver(post_save, sender=ShoppingCartRecipe)
+@receiver(post_delete, sender=ShoppingCartRecipe)
+def shopping_cart_changed(sender, instance, signal, **kwargs):
+    """Запись изменения в закэшированную корзину пользователя."""
+    transaction.on_commit(lambda: change_user_state(
+        SHOPPING_CART, instance, signal is post_save
+    ))
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCartRecipe)
+def recipe_counted(sender, instance, created, **kwargs):
+    """Учёт добавления Рецепта в избранное или корзину."""
+    if created:
+        change_counter(
+            Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], 1
+        )
+
+
+@receiver(post_save, sender=FavoriteRecipe)
+@receiver(post_save, sender=ShoppingCartRecipe)
+def recipe_activity_recorded(sender, instance, created, **kwargs):
+    """Учёт добавления Рецепта в почасовой активности для трендов."""
+    if created:
+        record_activity(instance.recipe_id, **{RECIPE_ACTIVITY[sender]: 1})
+
+
+@receiver(post_delete, sender=FavoriteRecipe)
+@receiver(post_delete, sender=ShoppingCartRecipe)
+def recipe_uncounted(sender, instance, **kwargs):
+    """Учёт удаления Рецепта из избранного или корзины."""
+    change_counter(Recipe, instance.recipe_id, RECIPE_COUNTERS[sender], -1)
+
+
+@receiver(post_save, sender=Recipe)
+def author_recipe_added(sender, instance, created, **kwargs):
+    """Учёт нового Рецепта автора."""
+    if created:
+        change_counter(User, instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def author_recipe_deleted(sender, instance, **kwargs):
+    """Учёт удалённого Рецепта автора."""
+    change_counter(User, instance.author_id, 'recipes_count', -1)
@@ -0,0 +1,238 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from recipes.cart_totals import find_cart_totals_mismatches
+from recipes.catalog import get_catalog_version
+from recipes.models import (
+    FavoriteRecipe,
+    Ingredient,
+    Recipe,
+    RecipeIngredient,
+    ShoppingCartRecipe,
+    Tag
+)
+from recipes.search import (
+    SimpleSearchBackend,
+    search_recipes,
+    update_search_vectors
+)
+from recipes.user_state import (
+    FAVORITES,
+    USER_STATE_KEY,
+    USER_STATE_VERSION_KEY,
+    UserState,
+    change_user_state
+)
+from users.models import User
+
+
+class SearchTest(TestCase):
+    """Поиск Рецептов по названию, описанию и Ингридиентам.
+
+    Регистр в запросах совпадает с данными: SQLite сравнивает
+    без учёта регистра только латиницу.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.local', password='pwd'
+        )
+        beet = Ingredient.objects.create(name='свёкла', measurement_unit='г')
+        cabbage = Ingredient.objects.create(
+            name='капуста', measurement_unit='г'
+        )
+        cls.recipes = {}
+        for name, text, ingredients in (
+            ('Борщ', 'Суп со свёклой.', (beet, cabbage)),
+            ('Щи', 'Суп из капусты, почти Борщ.', (cabbage,)),
+            ('Винегрет', 'Салат.', (beet,)),
+            ('Блины', 'Тесто на молоке.', ()),
+        ):
+            recipe = Recipe.objects.create(
+                name=name,
+                text=text,
+                image='recipes/images/test.png',
+                cooking_time=30,
+                author=author
+            )
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipe=recipe, ingredient=ingredient, amount=1
+                )
+                for ingredient in ingredients
+            )
+            cls.recipes[name] = recipe
+        # Сигнал заполняет вектор после фиксации транзакции,
+        # которой в TestCase не происходит.
+        update_search_vectors([recipe.pk for recipe in cls.recipes.values()])
+
+    def names(self, recipes):
+        return [recipe.name for recipe in recipes]
+
+    def test_simple_backend_ranks_name_first(self):
+        found = SimpleSearchBackend().search(Recipe.objects.all(), 'Борщ')
+        self.assertEqual(self.names(found), ['Борщ', 'Щи'])
+
+    def test_simple_backend_ingredients(self):
+        found = SimpleSearchBackend().search(Recipe.objects.all(), 'свёкла')
+        self.assertEqual(set(self.names(found)), {'Борщ', 'Винегрет'})
+
+    def test_simple_backend_all_words(self):
+        found = SimpleSearchBackend().search(
+            Recipe.objects.all(), 'Суп капуста'
+        )
+        self.assertEqual(set(self.names(found)), {'Борщ', 'Щи'})
+        found = SimpleSearchBackend().search(
+            Recipe.objects.all(), 'Блины капуста'
+        )
+        self.assertEqual(self.names(found), [])
+
+    def test_search_recipes(self):
+        found = search_recipes(Recipe.objects.all(), 'Блины')
+        self.assertEqual(self.names(found), ['Блины'])
+
+    def test_api_search(self):
+        response = self.client.get('/api/recipes/?search=Борщ')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [recipe['name'] for recipe in response.json()['results']],
+            ['Борщ', 'Щи']
+        )
+
+    def test_vector_not_loaded(self):
+        user = AnonymousUser()
+        for queryset in (
+            Recipe.objects.all(),
+            Recipe.objects.with_related(user),
+            Recipe.objects.with_versions(user),
+        ):
+            with self.subTest(query=str(queryset.query)):
+                self.assertNotIn('search_vector', str(queryset.query))
+
+
+class RecipeIngredientAdminTest(TestCase):
+    """Правка состава Рецепта в админке пересчитывает корзины."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.local', password='pwd'
+        )
+        salt = Ingredient.objects.create(name='соль', measurement_unit='г')
+        cls.recipes = [
+            Recipe.objects.create(
+                name=name,
+                text=name,
+                image='recipes/images/test.png',
+                cooking_time=10,
+                author=cls.admin
+            )
+            for name in ('Суп', 'Каша')
+        ]
+        cls.row = RecipeIngredient.objects.create(
+            recipe=cls.recipes[0], ingredient=salt, amount=10
+        )
+        for recipe in cls.recipes:
+            ShoppingCartRecipe.objects.create(user=cls.admin, recipe=recipe)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        self.url = f'/admin/recipes/recipeingredient/{self.row.pk}/'
+
+    def test_change_amount(self):
+        response = self.client.post(f'{self.url}change/', {
+            'recipe': self.recipes[0].pk,
+            'ingredient': self.row.ingredient_id,
+            'amount': 999,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(find_cart_totals_mismatches(), {})
+
+    def test_move_to_other_recipe(self):
+        response = self.client.post(f'{self.url}change/', {
+            'recipe': self.recipes[1].pk,
+            'ingredient': self.row.ingredient_id,
+            'amount': 5,
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(find_cart_totals_mismatches(), {})
+
+    def test_delete(self):
+        response = self.client.post(f'{self.url}delete/', {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(find_cart_totals_mismatches(), {})
+
+
+class CatalogVersionTest(TestCase):
+    """Версии справочников меняются только после фиксации транзакции."""
+
+    def test_bumped_on_commit(self):
+        for model, create in (
+            (Tag, lambda: Tag.objects.create(name='Суп', slug='soup')),
+            (Ingredient, lambda: Ingredient.objects.create(
+                name='соль', measurement_unit='г'
+            )),
+            (User, lambda: User.objects.create_user(
+                username='user', email='user@foodgram.local', password='pwd'
+            )),
+        ):
+            with self.subTest(model=model.__name__):
+                version = get_catalog_version(model)
+                with self.captureOnCommitCallbacks(execute=True):
+                    create()
+                    self.assertEqual(get_catalog_version(model), version)
+                self.assertNotEqual(get_catalog_version(model), version)
+
+
+@override_settings(USER_STATE_CACHE=True)
+class UserStateCacheTest(TestCase):
+    """Изменения избранного записываются в закэшированное множество."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='user', email='user@foodgram.local', password='pwd'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                name=name,
+                text=name,
+                image='recipes/images/test.png',
+                cooking_time=10,
+                author=cls.user
+            )
+            for name in ('Суп', 'Каша')
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.key = USER_STATE_KEY.format(FAVORITES, self.user.pk)
+
+    def favorites(self):
+        return UserState(self.user).load(
+            FAVORITES, {recipe.pk for recipe in self.recipes}
+        )
+
+    def test_write_through(self):
+        self.assertEqual(self.favorites(), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            favorite = FavoriteRecipe.objects.create(
+                user=self.user, recipe=self.recipes[0]
+            )
+        self.assertEqual(cache.get(self.key)[1], {self.recipes[0].pk})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.favorites(), {self.recipes[0].pk})
+        with self.captureOnCommitCallbacks(execute=True):
+            favorite.delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.favorites(), set())
+
+    def test_concurrent_change_drops_set(self):
+        self.favorites()
+        favorite = FavoriteRecipe(user=self.user, recipe=self.recipes[1])
+        # Изменение, записанное другим процессом мимо множества.
+        cache.incr(USER_STATE_VERSION_KEY.format(FAVORITES, self.user.pk))
+        change_user_state(FAVORITES, favorite, True)
+        self.assertIsNone(cache.get(self.key))
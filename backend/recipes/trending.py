@@ -0,0 +1,113 @@
+"""Тренды: Рецепты с наибольшим числом добавлений за последние сутки и неделю.
+
+Добавления в избранное и корзины накапливаются в почасовых строках
+RecipeActivity. Команда compact_trending объединяет часы старше
+TRENDING_HOURLY_PERIOD_HOURS в дневные строки, удаляет строки старше
+самого длинного окна и пересчитывает топ TrendingRecipe, который
+читается запросом трендов.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from core.constants import (
+    TRENDING_HOURLY_PERIOD_HOURS,
+    TRENDING_SIZE,
+    TRENDING_WINDOWS
+)
+from recipes.models import RecipeActivity, TrendingRecipe
+
+UPSERT_SQL = (
+    'INSERT INTO {activity} (recipe_id, period, favorites, carts) '
+    'VALUES (%s, %s, %s, %s) '
+    'ON CONFLICT (recipe_id, period) DO UPDATE SET '
+    'favorites = {activity}.favorites + excluded.favorites, '
+    'carts = {activity}.carts + excluded.carts'
+)
+
+
+def _upsert(rows):
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            UPSERT_SQL.format(activity=RecipeActivity._meta.db_table),
+            [
+                (recipe_id, adapt(period), favorites, carts)
+                for recipe_id, period, favorites, carts in rows
+            ]
+        )
+
+
+def current_period(now=None):
+    """Начало текущего часа."""
+    return (now or timezone.now()).replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(window, now=None):
+    """Начало окна тренда с точностью до часа."""
+    return current_period(now) - timedelta(hours=TRENDING_WINDOWS[window])
+
+
+def record_activity(recipe_id, favorites=0, carts=0):
+    """Учёт добавления Рецепта в избранное или корзину в текущем часе."""
+    _upsert([(recipe_id, current_period(), favorites, carts)])
+
+
+@transaction.atomic
+def compact_activity(now=None):
+    """Объединение старых часов в дни и удаление строк вне окон.
+
+    Дневная строка хранится в строке первого часа суток,
+    поэтому её период совпадает с почасовым.
+    """
+    compact_before = current_period(now) - timedelta(
+        hours=TRENDING_HOURLY_PERIOD_HOURS
+    )
+    hours = RecipeActivity.objects.filter(
+        period__lt=compact_before
+    ).exclude(period__hour=0)
+    _upsert(
+        hours.annotate(day=TruncDay('period')).values_list(
+            'recipe_id', 'day'
+        ).annotate(
+            favorites_sum=Sum('favorites'), carts_sum=Sum('carts')
+        ).order_by()
+    )
+    hours.delete()
+    longest = max(TRENDING_WINDOWS, key=TRENDING_WINDOWS.get)
+    RecipeActivity.objects.filter(
+        period__lt=window_start(longest, now)
+    ).delete()
+
+
+@transaction.atomic
+def refresh_trending(now=None):
+    """Пересчёт топа TRENDING_SIZE Рецептов для каждого окна."""
+    for window in TRENDING_WINDOWS:
+        scores = RecipeActivity.objects.filter(
+            period__gte=window_start(window, now)
+        ).values_list('recipe_id').annotate(
+            score=Sum('favorites') + Sum('carts')
+        ).order_by('-score', '-recipe_id')[:TRENDING_SIZE]
+        TrendingRecipe.objects.filter(window=window).delete()
+        TrendingRecipe.objects.bulk_create(
+            TrendingRecipe(
+                window=window,
+                position=position,
+                recipe_id=recipe_id,
+                score=score
+            )
+            for position, (recipe_id, score) in enumerate(scores, 1)
+        )
+
+
+def trending_recipe_ids(window):
+    """Id Рецептов рассчитанного топа в порядке мест."""
+    return list(
+        TrendingRecipe.objects.filter(window=window).values_list(
+            'recipe_id', flat=True
+        )
+    )
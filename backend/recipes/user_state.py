@@ -0,0 +1,125 @@
+"""Подписки, избранное и корзина текущего пользователя.
+
+Состояние загружается один раз на запрос и только для объектов
+сериализуемой страницы. При USER_STATE_CACHE полные множества id
+берутся из общего кэша, а изменения записываются в них сразу.
+
+Каждое изменение увеличивает счётчик версии множества. Изменение
+записывается, только если множество построено на предыдущей версии,
+иначе оно удаляется: параллельная запись могла потеряться.
+Множество другой версии при чтении загружается заново.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model
+
+from core.constants import USER_STATE_CACHE_TIMEOUT
+from recipes.models import FavoriteRecipe, ShoppingCartRecipe
+from users.models import Subscribe
+
+USER_STATE_KEY = 'user-state:{}:{}'
+USER_STATE_VERSION_KEY = 'user-state-version:{}:{}'
+
+SUBSCRIPTIONS = 'subscriptions'
+FAVORITES = 'favorites'
+SHOPPING_CART = 'shopping_cart'
+
+SOURCES = {
+    SUBSCRIPTIONS: (Subscribe, 'author_id'),
+    FAVORITES: (FavoriteRecipe, 'recipe_id'),
+    SHOPPING_CART: (ShoppingCartRecipe, 'recipe_id'),
+}
+
+
+def get_user_state_version(kind, user_id):
+    key = USER_STATE_VERSION_KEY.format(kind, user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 0, USER_STATE_CACHE_TIMEOUT)
+        version = cache.get(key, 0)
+    return version
+
+
+def change_user_state(kind, instance, added):
+    """Запись добавленного или удалённого объекта в кэш множества."""
+    if not settings.USER_STATE_CACHE:
+        return
+    field = SOURCES[kind][1]
+    key = USER_STATE_KEY.format(kind, instance.user_id)
+    try:
+        version = cache.incr(
+            USER_STATE_VERSION_KEY.format(kind, instance.user_id)
+        )
+    except ValueError:
+        cache.delete(key)
+        return
+    cached = cache.get(key)
+    if cached is None:
+        return
+    cached_version, ids = cached
+    if cached_version != version - 1:
+        cache.delete(key)
+        return
+    object_id = getattr(instance, field)
+    ids = ids | {object_id} if added else ids - {object_id}
+    cache.set(key, (version, ids), USER_STATE_CACHE_TIMEOUT)
+
+
+def page_ids(serializer, obj):
+    """id объектов страницы, к которой относится obj.
+
+    Берутся объекты той же модели из корня сериализатора,
+    а для объектов другой модели - их авторы.
+    """
+    instance = serializer.root.instance
+    if instance is None or isinstance(instance, Model):
+        return ()
+    return [
+        item.pk if isinstance(item, type(obj))
+        else getattr(item, 'author_id', None)
+        for item in instance
+    ]
+
+
+class UserState:
+    """Состояние пользователя в рамках одного запроса."""
+
+    def __init__(self, user):
+        self.user = user
+        self.checked = {kind: set() for kind in SOURCES}
+        self.found = {kind: set() for kind in SOURCES}
+
+    @classmethod
+    def for_request(cls, request):
+        """Общее для всех сериализаторов запроса состояние."""
+        state = getattr(request, 'user_state', None)
+        if state is None:
+            state = request.user_state = cls(request.user)
+        return state
+
+    def contains(self, kind, object_id, batch=()):
+        if not self.user.is_authenticated:
+            return False
+        if object_id not in self.checked[kind]:
+            ids = {object_id, *batch} - self.checked[kind] - {None}
+            self.checked[kind] |= ids
+            self.found[kind] |= self.load(kind, ids)
+        return object_id in self.found[kind]
+
+    def load(self, kind, ids):
+        model, field = SOURCES[kind]
+        queryset = model.objects.filter(user=self.user)
+        if not settings.USER_STATE_CACHE:
+            return set(queryset.filter(
+                **{f'{field}__in': ids}
+            ).values_list(field, flat=True))
+        key = USER_STATE_KEY.format(kind, self.user.pk)
+        # Версия читается до БД: изменения после неё запишутся поверх.
+        version = get_user_state_version(kind, self.user.pk)
+        cached = cache.get(key)
+        if cached is None or cached[0] != version:
+            cached = (
+                version, frozenset(queryset.values_list(field, flat=True))
+            )
+            cache.set(key, cached, USER_STATE_CACHE_TIMEOUT)
+        return cached[1] & ids
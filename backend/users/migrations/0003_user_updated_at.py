@@ -0,0 +1,20 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:31
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+    ]
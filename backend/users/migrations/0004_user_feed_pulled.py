@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='feed_pulled',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Рецепты в ленты подписчиков добавляются при чтении'),
+        ),
+    ]
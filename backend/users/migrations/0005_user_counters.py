@@ -0,0 +1,45 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, relation):
+    return Coalesce(Subquery(
+        model.objects.filter(**{relation: OuterRef('pk')}).order_by().values(
+            relation
+        ).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    User.objects.update(
+        recipes_count=count_of(apps.get_model('recipes', 'Recipe'), 'author'),
+        followers_count=count_of(
+            apps.get_model('users', 'Subscribe'), 'author'
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_feed_pulled'),
+        ('recipes', '0011_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -39,6 +39,31 @@ class User(AbstractUser):
         default=None,
         verbose_name='Аватар'
     )
+    avatar_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Варианты аватара'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество рецептов'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество подписчиков'
+    )
+    feed_pulled = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Рецепты в ленты подписчиков добавляются при чтении'
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
         'username',
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.constants import AVATAR_IMAGE_SIZES
+from core.images import schedule_image_variants
+from recipes.catalog import bump_catalog_version_on_commit
+from recipes.counters import change_counter
+from recipes.feed import subscribe_feed, unsubscribe_feed
+from recipes.user_state import SUBSCRIPTIONS, change_user_state
+from users.models import Subscribe, User
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, **kwargs):
+    """Построение вариантов нового аватара."""
+    schedule_image_variants(instance, 'avatar', AVATAR_IMAGE_SIZES)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def users_changed(sender, **kwargs):
+    """Смена версии Пользователей: сброс кэшированных count выборок."""
+    bump_catalog_version_on_commit(User)
+
+
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def user_subscriptions_changed(sender, instance, **kwargs):
+    """Смена версии подписок одного пользователя."""
+    bump_catalog_version_on_commit(Subscribe, instance.user_id)
+
+
+@receiver(post_save, sender=Subscribe)
+@receiver(post_delete, sender=Subscribe)
+def subscriptions_changed(sender, instance, signal, **kwargs):
+    """Запись изменения в закэшированные подписки пользователя."""
+    transaction.on_commit(lambda: change_user_state(
+        SUBSCRIPTIONS, instance, signal is post_save
+    ))
+
+
+@receiver(post_save, sender=Subscribe)
+def subscription_created(sender, instance, created, **kwargs):
+    """Учёт подписчика и последние Рецепты автора в его ленте."""
+    if created:
+        change_counter(User, instance.author_id, 'followers_count', 1)
+        transaction.on_commit(
+            lambda: subscribe_feed(instance.user_id, instance.author_id)
+        )
+
+
+@receiver(post_delete, sender=Subscribe)
+def subscription_deleted(sender, instance, **kwargs):
+    """Учёт отписки и удаление Рецептов автора из ленты."""
+    change_counter(User, instance.author_id, 'followers_count', -1)
+    unsubscribe_feed(instance.user_id, instance.author_id)